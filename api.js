@@ -7,24 +7,64 @@ const API = {
         ? 'http://localhost:5000' 
         : window.location.origin,
     
+    pollInterval: 250,
+    currentJobId: null,
+    
+    /** Media type of the packed binary preview format (see preview_format.py) */
+    previewMediaType: 'application/vnd.pillars-grid.preview',
+    lastPreview: null, // { etag, data } of the last preview received
+    sessionId: Math.random().toString(36).slice(2), // tags this page's preview requests
+    
     /**
      * Fetch preview data (lightweight, positions only)
+     * 
+     * Positions arrive as packed float32 arrays and are returned as
+     * { length, xy } point arrays, xy holding interleaved x, y pairs. An
+     * unchanged layout is answered with 304 and the previous data is reused.
+     * Requests tagged with a sequence number are dropped by the server once
+     * a later one of this page arrives. The layout's clearance report
+     * ({ ok, min_clearance, pillar_pillar, pillar_hole, edge }, see /check)
+     * comes in the X-Clearance header.
      * @param {Object} parameters - API-formatted parameters
-     * @returns {Promise<Object>} { pillars, holes, bounds }
+     * @param {number} [sequence] - increasing request number
+     * @returns {Promise<Object|null>} { pillars, holes, bounds, clearance }, or null if superseded
      */
-    async fetchPreview(parameters) {
+    async fetchPreview(parameters, sequence) {
         try {
+            const headers = {
+                'Content-Type': 'application/json',
+                'Accept': `${this.previewMediaType}, application/json;q=0.5`
+            };
+            if (this.lastPreview) {
+                headers['If-None-Match'] = this.lastPreview.etag;
+            }
+            Object.assign(headers, this._sequenceHeaders(sequence));
+            
             const response = await fetch(`${this.baseUrl}/preview`, {
                 method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
+                headers,
                 body: JSON.stringify(parameters)
             });
             
+            if (response.status === 304 && this.lastPreview) {
+                return this.lastPreview.data;
+            }
+            if (response.status === 409) {
+                return null;
+            }
             if (!response.ok) {
                 throw new Error(`Preview failed: ${response.statusText}`);
             }
             
-            return await response.json();
+            const contentType = response.headers.get('Content-Type') || '';
+            const data = contentType.startsWith(this.previewMediaType)
+                ? this._decodePreview(await response.arrayBuffer())
+                : this._pointArraysFromJSON(await response.json());
+            data.clearance = JSON.parse(response.headers.get('X-Clearance') || 'null');
+            
+            const etag = response.headers.get('ETag');
+            this.lastPreview = etag ? { etag, data } : null;
+            return data;
         } catch (error) {
             console.error('Preview error:', error);
             throw error;
@@ -32,18 +72,153 @@ const API = {
     },
     
     /**
-     * Generate full STL file
+     * Fetch the part of a preview visible at one zoom level
+     * 
+     * For grids too large to send whole: the server frames the floor as the
+     * renderer does and returns the visible pillars and holes, or per-cell
+     * counts (density) where they would be drawn below a pixel, with the
+     * layout's counts, extent, clearance report and measurement anchors.
      * @param {Object} parameters - API-formatted parameters
-     * @returns {Promise<Object>} { blob, metadata: { time, dimensions } }
+     * @param {Object} view - { width, height, zoom } of the canvas
+     * @param {number} [sequence] - increasing request number
+     * @returns {Promise<Object|null>} { pillars, holes, bounds, extent, counts,
+     *     anchors, clearance, density, view }, or null if superseded
      */
-    async generateSTL(parameters) {
+    async fetchPreviewRegion(parameters, view, sequence) {
         try {
-            const response = await fetch(`${this.baseUrl}/generate`, {
+            const response = await fetch(`${this.baseUrl}/preview/region`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json', ...this._sequenceHeaders(sequence) },
+                body: JSON.stringify({ ...parameters, view })
+            });
+            
+            if (response.status === 409) {
+                return null;
+            }
+            if (!response.ok) {
+                throw new Error(`Preview failed: ${response.statusText}`);
+            }
+            
+            const json = await response.json();
+            const pack = flat => ({ length: (flat || []).length / 2, xy: new Float32Array(flat || []) });
+            return {
+                pillars: pack(json.pillars),
+                holes: pack(json.holes),
+                bounds: json.bounds,
+                extent: json.extent,
+                counts: json.counts,
+                anchors: json.anchors,
+                clearance: json.clearance,
+                density: json.density || null,
+                view
+            };
+        } catch (error) {
+            console.error('Preview error:', error);
+            throw error;
+        }
+    },
+    
+    /**
+     * Headers tagging a preview request with this page's session
+     * @param {number} [sequence] - increasing request number; untagged if omitted
+     */
+    _sequenceHeaders(sequence) {
+        if (sequence === undefined) return {};
+        return {
+            'X-Preview-Session': this.sessionId,
+            'X-Preview-Sequence': String(sequence)
+        };
+    },
+    
+    /**
+     * Read a binary preview payload without copying the coordinates
+     * @param {ArrayBuffer} buffer
+     * @returns {Object} { pillars, holes, bounds }
+     */
+    _decodePreview(buffer) {
+        const header = new DataView(buffer, 0, 48);
+        const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+        if (magic !== 'PGPV' || header.getUint32(4, true) !== 1) {
+            throw new Error('Preview failed: unsupported preview format');
+        }
+        
+        const pillarCount = header.getUint32(8, true);
+        const holeCount = header.getUint32(12, true);
+        return {
+            pillars: { length: pillarCount, xy: new Float32Array(buffer, 48, 2 * pillarCount) },
+            holes: { length: holeCount, xy: new Float32Array(buffer, 48 + 8 * pillarCount, 2 * holeCount) },
+            bounds: {
+                minX: header.getFloat64(16, true),
+                maxX: header.getFloat64(24, true),
+                minY: header.getFloat64(32, true),
+                maxY: header.getFloat64(40, true)
+            }
+        };
+    },
+    
+    /**
+     * Convert a JSON preview's point objects to point arrays
+     * @param {Object} json - { pillars: [{x, y}], holes: [{x, y}], bounds }
+     * @returns {Object} { pillars, holes, bounds }
+     */
+    _pointArraysFromJSON(json) {
+        const pack = points => {
+            const xy = new Float32Array(2 * points.length);
+            points.forEach((p, i) => {
+                xy[2 * i] = p.x;
+                xy[2 * i + 1] = p.y;
+            });
+            return { length: points.length, xy };
+        };
+        return { pillars: pack(json.pillars), holes: pack(json.holes), bounds: json.bounds };
+    },
+    
+    /**
+     * Generate full STL file through the job API
+     * @param {Object} parameters - API-formatted parameters
+     * @param {Function} [onProgress] - called with each job status while polling
+     * @returns {Promise<Object>} { blob, metadata: { time, dimensions, triangles, assembly } }
+     */
+    async generateSTL(parameters, onProgress) {
+        try {
+            const submit = await fetch(`${this.baseUrl}/jobs`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify(parameters)
             });
             
+            if (submit.status === 422) {
+                // Rejected by the clearance check, before any geometry was built
+                const rejection = await submit.json();
+                throw Object.assign(new Error(rejection.error), { clearance: rejection.clearance });
+            }
+            if (!submit.ok) {
+                throw new Error(`Generation failed: ${submit.statusText}`);
+            }
+            
+            let job = await submit.json();
+            this.currentJobId = job.job_id;
+            
+            while (job.status === 'queued' || job.status === 'running') {
+                if (onProgress) onProgress(job);
+                await new Promise(resolve => setTimeout(resolve, this.pollInterval));
+                
+                const poll = await fetch(`${this.baseUrl}/jobs/${job.job_id}`);
+                if (!poll.ok) {
+                    throw new Error(`Generation failed: ${poll.statusText}`);
+                }
+                job = await poll.json();
+            }
+            
+            this.currentJobId = null;
+            if (onProgress) onProgress(job);
+            
+            if (job.status !== 'done') {
+                throw new Error(`Generation ${job.status}${job.error ? ': ' + job.error : ''}`);
+            }
+            
+            const response = await fetch(`${this.baseUrl}/jobs/${job.job_id}/result`);
+            
             if (!response.ok) {
                 throw new Error(`Generation failed: ${response.statusText}`);
             }
@@ -51,13 +226,32 @@ const API = {
             const blob = await response.blob();
             const metadata = {
                 time: response.headers.get('X-Generation-Time'),
-                dimensions: response.headers.get('X-Dimensions')
+                dimensions: response.headers.get('X-Dimensions'),
+                triangles: response.headers.get('X-Triangles'),
+                assembly: response.headers.get('X-Assembly')
             };
             
             return { blob, metadata };
         } catch (error) {
+            this.currentJobId = null;
             console.error('Generation error:', error);
             throw error;
         }
+    },
+    
+    /**
+     * Cancel the STL generation job in progress, if any
+     * @returns {Promise<boolean>} whether a job was cancelled
+     */
+    async cancelGeneration() {
+        if (!this.currentJobId) return false;
+        
+        const response = await fetch(`${this.baseUrl}/jobs/${this.currentJobId}`, {
+            method: 'DELETE'
+        });
+        if (!response.ok) return false;
+        
+        const result = await response.json();
+        return result.cancelled;
     }
 };
\ No newline at end of file
@@ -0,0 +1,408 @@
+import numpy as np
+import trimesh
+from itertools import chain
+from scipy.spatial import Voronoi, cKDTree
+from typing import List, Tuple
+
+# Direct (boolean-free) assembly of the pillar grid.
+#
+# The floor is partitioned into the Voronoi cells of all pillar and hole
+# centers, clipped to the floor rectangle. Every circle lies inside its own
+# cell, so each cell face is an annulus between the cell polygon and the
+# circle, which is zipped together without any general triangulation. Pillar
+# walls start on the same ring of vertices the floor top face ends on, and
+# the rim is stitched onto the floor's outer boundary, so the result is one
+# watertight mesh built in time linear in the number of positions.
+
+def _ring_next(group):
+    """Index of the next element within each contiguous group, wrapping around"""
+    n = len(group)
+    idx = np.arange(n)
+    is_start = np.r_[True, group[1:] != group[:-1]]
+    is_end = np.r_[group[1:] != group[:-1], True]
+    start = np.maximum.accumulate(np.where(is_start, idx, 0))
+    nxt = idx + 1
+    nxt[is_end] = start[is_end]
+    return nxt
+
+def _orient_horizontal(faces, vertices, up):
+    """Flip horizontal triangles so their normals point up (+z) or down (-z)"""
+    tri = vertices[faces][:, :, :2]
+    cross = ((tri[:, 1, 0] - tri[:, 0, 0]) * (tri[:, 2, 1] - tri[:, 0, 1]) -
+             (tri[:, 1, 1] - tri[:, 0, 1]) * (tri[:, 2, 0] - tri[:, 0, 0]))
+    flip = cross < 0 if up else cross > 0
+    faces[flip] = faces[flip][:, ::-1]
+    return faces
+
+def _band(lower, upper, outward=True):
+    """Quads between two parallel vertex loops (K, N), lower to upper"""
+    a = lower
+    b = np.roll(lower, -1, axis=1)
+    c = np.roll(upper, -1, axis=1)
+    d = upper
+    if outward:
+        faces = [np.stack([a, b, c], axis=-1), np.stack([a, c, d], axis=-1)]
+    else:
+        faces = [np.stack([a, c, b], axis=-1), np.stack([a, d, c], axis=-1)]
+    return np.concatenate([f.reshape(-1, 3) for f in faces])
+
+def _circle(sections):
+    angles = 2 * np.pi * np.arange(sections) / sections
+    return np.column_stack([np.cos(angles), np.sin(angles)])
+
+def _cap(rings):
+    """Fan triangles closing each counter-clockwise vertex ring (N, sections), facing up"""
+    sections = rings.shape[1]
+    j = np.arange(1, sections - 1)
+    return np.column_stack([
+        np.repeat(rings[:, 0], len(j)),
+        rings[:, j].ravel(),
+        rings[:, j + 1].ravel()
+    ])
+
+def _pillar_faces(bottom, top):
+    """Side walls and top caps for pillar rings (N, sections), open at the bottom"""
+    return _band(bottom, top, outward=True), _cap(top)
+
+def pillar_face_count(sections=32, closed=False):
+    """Triangles per pillar from pillar_shells: walls plus top cap, and bottom cap if closed"""
+    return 2 * sections + (sections - 2) * (2 if closed else 1)
+
+def pillar_shells(positions, radius, height, floor_thickness, sections=32):
+    """
+    Pillar walls and caps without bottoms, for pairing with a base mesh
+    built by assemble_model(..., pillars=False)
+
+    Ring coordinates are computed exactly as in assemble_model, so each
+    pillar meets its ring on the floor top face bit for bit.
+    """
+    positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+    n = len(positions)
+    ring_xy = (positions[:, None, :] + radius * _circle(sections)).reshape(-1, 2)
+    vertices = np.vstack([
+        np.column_stack([ring_xy, np.full(len(ring_xy), floor_thickness)]),
+        np.column_stack([ring_xy, np.full(len(ring_xy), floor_thickness + height)])
+    ])
+    bottom = np.arange(n * sections).reshape(n, sections)
+    walls, caps = _pillar_faces(bottom, bottom + n * sections)
+    return vertices, np.vstack([walls, caps])
+
+def pillar_template(radius, height, floor_thickness, sections=32, closed=False):
+    """
+    One pillar at the origin, for exporters that place a shared pillar mesh
+    at every pillar position
+
+    Args:
+        closed: also cap the bottom, for pairing with a base built with
+            cap_pillars=True instead of an open shell from pillar_shells
+
+    Returns:
+        (vertices, faces)
+    """
+    vertices, faces = pillar_shells([(0.0, 0.0)], radius, height, floor_thickness, sections)
+    if closed:
+        faces = np.vstack([faces, _cap(np.arange(sections)[None])[:, ::-1]])
+    return vertices, faces
+
+def conflicting_pairs(sites, radii):
+    """
+    Pairs of sites whose circles could leave their own Voronoi cells
+
+    Returns:
+        (K, 2) site index pairs closer than twice the larger radius
+    """
+    if len(sites) < 2:
+        return np.empty((0, 2), dtype=np.intp)
+    pairs = cKDTree(sites).query_pairs(2 * radii.max(), output_type='ndarray')
+    dist = np.linalg.norm(sites[pairs[:, 0]] - sites[pairs[:, 1]], axis=1)
+    return pairs[dist <= 2 * np.maximum(radii[pairs[:, 0]], radii[pairs[:, 1]])]
+
+def check_direct_assembly(sites, radii, bounds):
+    """
+    Check that every circle fits inside its own clipped Voronoi cell
+
+    Raises:
+        ValueError: if two circles come closer than allowed or a circle
+            crosses the floor edge
+    """
+    min_x, max_x, min_y, max_y = bounds
+    edge = np.minimum.reduce([
+        sites[:, 0] - min_x, max_x - sites[:, 0],
+        sites[:, 1] - min_y, max_y - sites[:, 1]
+    ])
+    if np.any(edge <= radii):
+        raise ValueError("circle crosses the floor edge")
+
+    if len(conflicting_pairs(sites, radii)):
+        raise ValueError("circles too close for direct assembly")
+
+def clipped_voronoi_cells(sites, bounds):
+    """
+    Voronoi cells of sites clipped to the bounds rectangle
+
+    Returns:
+        coords: (M, 2) unique cell vertices, snapped onto the rectangle edges
+        group: site index of each cell vertex entry, CCW within each cell
+        ids: vertex index into coords of each cell vertex entry
+    """
+    min_x, max_x, min_y, max_y = bounds
+    n = len(sites)
+    x, y = sites[:, 0], sites[:, 1]
+
+    # Mirroring a site across an edge its cell reaches clips that cell
+    # exactly to the rectangle. A cell can only reach an edge if its site is
+    # within the largest empty-circle radius along that edge, which is
+    # bounded by sampling the edge against a KD-tree of the sites.
+    tree = cKDTree(sites)
+    step = np.sqrt((max_x - min_x) * (max_y - min_y) / n)
+    mirrored = [sites]
+    for axis, value, lo, hi in ((0, min_x, min_y, max_y), (0, max_x, min_y, max_y),
+                                (1, min_y, min_x, max_x), (1, max_y, min_x, max_x)):
+        along = np.linspace(lo, hi, int(np.ceil((hi - lo) / step)) + 1)
+        samples = np.column_stack([np.full_like(along, value), along])
+        if axis == 1:
+            samples = samples[:, ::-1]
+        reach = tree.query(samples)[0].max() + step / 2
+        near = sites[np.abs(sites[:, axis] - value) <= reach].copy()
+        near[:, axis] = 2 * value - near[:, axis]
+        mirrored.append(near)
+    vor = Voronoi(np.vstack(mirrored))
+
+    regions = [vor.regions[r] for r in vor.point_region[:n]]
+    counts = np.fromiter(map(len, regions), dtype=np.intp, count=n)
+    flat = np.fromiter(chain.from_iterable(regions), dtype=np.intp, count=counts.sum())
+    group = np.repeat(np.arange(n), counts)
+
+    # Snap onto the edges and merge near-duplicate vertices
+    tol = 1e-9 * max(max_x - min_x, max_y - min_y, 1.0)
+    used, flat = np.unique(flat, return_inverse=True)
+    coords = vor.vertices[used].copy()
+    for axis, lo, hi in ((0, min_x, max_x), (1, min_y, max_y)):
+        coords[np.abs(coords[:, axis] - lo) < tol, axis] = lo
+        coords[np.abs(coords[:, axis] - hi) < tol, axis] = hi
+    kx = np.round((coords[:, 0] - min_x) / tol).astype(np.int64)
+    ky = np.round((coords[:, 1] - min_y) / tol).astype(np.int64)
+    keys = kx * (ky.max() + 1) + ky
+    _, first, canon = np.unique(keys, return_index=True, return_inverse=True)
+    coords = coords[first]
+    ids = canon[flat]
+
+    keep = ids != ids[_ring_next(group)]
+    ids, group = ids[keep], group[keep]
+
+    # Make every cell counter-clockwise
+    nxt = _ring_next(group)
+    p, q = coords[ids], coords[ids[nxt]]
+    area = np.bincount(group, p[:, 0] * q[:, 1] - q[:, 0] * p[:, 1], minlength=n)
+    cw = area[group] < 0
+    if np.any(cw):
+        starts = np.searchsorted(group, group)
+        ends = np.searchsorted(group, group, side='right')
+        order = np.arange(len(ids))
+        order[cw] = (starts + ends - 1 - order)[cw]
+        ids = ids[order]
+
+    return coords, group, ids
+
+def _zip_cells(group, outer, outer_coords, rings):
+    """
+    Triangulate the annulus between each cell polygon and its circle ring
+
+    Each cell edge takes the ring vertex closest to its normal direction
+    as apex, each ring edge takes the cell vertex whose edge normals
+    bracket it, which keeps every triangle outside the circle.
+    """
+    n_sites, sections = rings.shape
+    nxt = _ring_next(group)
+    src, dst = outer, outer[nxt]
+
+    d = outer_coords[nxt] - outer_coords
+    phi = np.mod(np.arctan2(-d[:, 0], d[:, 1]), 2 * np.pi)
+    mid = np.pi * (2 * np.arange(sections) + 1) / sections
+
+    # Keep each cell's edges in ring order when normals tie
+    pos = np.arange(len(group))
+    counts = np.bincount(group, minlength=n_sites)
+    lowest = np.full(n_sites, np.inf)
+    np.minimum.at(lowest, group, phi)
+    anchor = np.full(n_sites, len(group))
+    np.minimum.at(anchor, group, np.where(phi == lowest[group], pos, len(group)))
+    rank = np.mod(pos - anchor[group], counts[group])
+
+    ring_group = np.repeat(np.arange(n_sites), sections)
+    ring_edge = np.tile(np.arange(sections), n_sites)
+
+    ev_group = np.r_[group, ring_group]
+    ev_key = np.r_[phi, np.tile(mid, n_sites)]
+    ev_inner = np.r_[np.zeros(len(group), bool), np.ones(len(ring_group), bool)]
+    ev_rank = np.r_[rank, ring_edge]
+    order = np.lexsort((ev_rank, ev_inner, ev_key, ev_group))
+    ev_group, ev_inner = ev_group[order], ev_inner[order]
+    ev_index = np.r_[pos, np.arange(len(ring_group))][order]
+
+    ev_start = np.searchsorted(ev_group, ev_group)
+    n_inner = np.cumsum(ev_inner) - ev_inner
+    n_inner -= n_inner[ev_start]
+    n_outer = np.cumsum(~ev_inner) - ~ev_inner
+    n_outer -= n_outer[ev_start]
+
+    # Cell edge destinations in normal order, used as apex for ring edges
+    sorted_dst = dst[ev_index[~ev_inner]]
+    outer_start = np.r_[0, np.cumsum(counts)[:-1]]
+
+    o = ~ev_inner
+    og = ev_group[o]
+    oi = ev_index[o]
+    outer_faces = np.column_stack([
+        src[oi], dst[oi], rings[og, n_inner[o] % sections]
+    ])
+
+    i = ev_inner
+    ig = ev_group[i]
+    j = ev_index[i] % sections
+    apex = sorted_dst[outer_start[ig] + np.mod(n_outer[i] - 1, counts[ig])]
+    inner_faces = np.column_stack([
+        rings[ig, (j + 1) % sections], rings[ig, j], apex
+    ])
+
+    return np.vstack([outer_faces, inner_faces])
+
+def assemble_model(pillar_positions: List[Tuple[float, float]], hole_positions: List[Tuple[float, float]],
+                   bounds, pillar_radius, pillar_height, hole_radius, floor_thickness,
+                   wall_thickness=0.5, sections=32, pillars=True, cap_pillars=False):
+    """
+    Build the watertight pillar grid (floor, holes, pillars and rim) directly
+
+    Args:
+        pillar_positions: (x, y) pillar centers
+        hole_positions: (x, y) hole centers
+        bounds: (min_x, max_x, min_y, max_y) of the floor
+        wall_thickness: rim thickness around the floor, 0 for no rim
+        sections: segments per pillar and hole circle
+        pillars: if False, leave out pillar walls and caps (see pillar_shells)
+        cap_pillars: with pillars=False, close each pillar ring on the floor
+            top with a flat cap so the base is a closed mesh on its own
+
+    Raises:
+        ValueError: if the layout needs a boolean union (see check_direct_assembly)
+    """
+    include_pillars = pillars
+    pillars = np.asarray(pillar_positions, dtype=float).reshape(-1, 2)
+    holes = np.asarray(hole_positions, dtype=float).reshape(-1, 2)
+    sites = np.vstack([pillars, holes])
+    n_pillars, n_sites = len(pillars), len(sites)
+    radii = np.r_[np.full(n_pillars, pillar_radius), np.full(len(holes), hole_radius)]
+
+    if n_sites == 0:
+        raise ValueError("no positions to assemble")
+    check_direct_assembly(sites, radii, bounds)
+
+    min_x, max_x, min_y, max_y = bounds
+    wall_height = floor_thickness + pillar_height
+    coords, group, ids = clipped_voronoi_cells(sites, bounds)
+    n_coords = len(coords)
+
+    ring_xy = (sites[:, None, :] + radii[:, None, None] * _circle(sections)).reshape(-1, 2)
+    n_tops = n_pillars * sections if include_pillars else 0
+
+    # Outer boundary loop of the floor, counter-clockwise from (min_x, min_y)
+    on_edge = ((coords[:, 0] == min_x) | (coords[:, 0] == max_x) |
+               (coords[:, 1] == min_y) | (coords[:, 1] == max_y))
+    loop = np.flatnonzero(on_edge)
+    lx, ly = coords[loop, 0], coords[loop, 1]
+    # Side 0-3 (bottom, right, top, left) from exact edge tests; each floor
+    # corner starts the side it opens, so side and corners never depend on
+    # rounding of a perimeter parameter
+    side = np.select(
+        [(ly == min_y) & (lx < max_x), (lx == max_x) & (ly < max_y), (ly == max_y) & (lx > min_x)],
+        [0, 1, 2], 3
+    )
+    along = np.select([side == 0, side == 1, side == 2], [lx, ly, -lx], -ly)
+    order = np.lexsort((along, side))
+    loop, side = loop[order], side[order]
+
+    # Vertex blocks
+    blocks = [
+        np.column_stack([coords, np.zeros(n_coords)]),                     # floor bottom
+        np.column_stack([coords, np.full(n_coords, floor_thickness)]),     # floor top
+        np.column_stack([ring_xy, np.full(len(ring_xy), floor_thickness)]),  # rings on floor top
+        np.column_stack([ring_xy[:n_tops], np.full(n_tops, wall_height)]),  # pillar tops
+        np.column_stack([ring_xy[n_pillars * sections:],
+                         np.zeros(len(holes) * sections)]),                # hole bottoms
+        np.column_stack([pillars, np.zeros(n_pillars)]),                   # pillar bottom centers
+    ]
+    offsets = np.cumsum([0] + [len(b) for b in blocks])
+    bottom, top, rings_top, pillar_tops, hole_bottoms, centers = offsets[:6]
+
+    rings = rings_top + np.arange(n_sites * sections).reshape(n_sites, sections)
+    ring_pillar_top = pillar_tops + np.arange(n_tops).reshape(-1, sections)
+    ring_hole_bottom = hole_bottoms + np.arange(len(holes) * sections).reshape(-1, sections)
+
+    faces_up, faces_down, faces_side = [], [], []
+
+    # Floor top: every cell zipped to its circle
+    faces_up.append(_zip_cells(group, top + ids, coords[ids], rings))
+
+    # Floor bottom: hole cells zipped to their circles, pillar cells fanned
+    is_hole = group >= n_pillars
+    if len(holes):
+        faces_down.append(_zip_cells(
+            group[is_hole] - n_pillars, bottom + ids[is_hole], coords[ids[is_hole]],
+            ring_hole_bottom
+        ))
+    if n_pillars:
+        pg, pids = group[~is_hole], ids[~is_hole]
+        nxt = _ring_next(pg)
+        faces_down.append(np.column_stack([bottom + pids[nxt], bottom + pids, centers + pg]))
+
+    # Pillar walls and caps, hole walls
+    if n_pillars and include_pillars:
+        walls, caps = _pillar_faces(rings[:n_pillars], ring_pillar_top)
+        faces_side.append(walls)
+        faces_up.append(caps)
+    elif n_pillars and cap_pillars:
+        faces_up.append(_cap(rings[:n_pillars]))
+    if len(holes):
+        faces_side.append(_band(ring_hole_bottom, rings[n_pillars:], outward=False))
+
+    vertices = np.vstack(blocks)
+
+    if wall_thickness > 0:
+        corners = np.array([
+            [min_x - wall_thickness, min_y - wall_thickness],
+            [max_x + wall_thickness, min_y - wall_thickness],
+            [max_x + wall_thickness, max_y + wall_thickness],
+            [min_x - wall_thickness, max_y + wall_thickness],
+        ])
+        rim = len(vertices)
+        vertices = np.vstack([
+            vertices,
+            np.column_stack([coords[loop], np.full(len(loop), wall_height)]),
+            np.column_stack([corners, np.zeros(4)]),
+            np.column_stack([corners, np.full(4, wall_height)]),
+        ])
+        loop_top = rim + np.arange(len(loop))
+        outer_bottom = rim + len(loop) + np.arange(4)
+        outer_top = outer_bottom + 4
+
+        # Rim bottom and top: fan each side of the boundary loop from the
+        # outer corner where that side starts
+        inner_corners = np.searchsorted(side, np.arange(4))
+        nxt = np.roll(np.arange(len(loop)), -1)
+        for base, outer, up in ((bottom + loop, outer_bottom, False), (loop_top, outer_top, True)):
+            fan = np.column_stack([base, base[nxt], outer[side]])
+            close = np.column_stack([outer, np.roll(outer, -1), base[np.roll(inner_corners, -1)]])
+            (faces_up if up else faces_down).extend([fan, close])
+
+        faces_side.append(_band((top + loop)[None], loop_top[None], outward=False))
+        faces_side.append(_band(outer_bottom[None], outer_top[None], outward=True))
+    else:
+        faces_side.append(_band((bottom + loop)[None], (top + loop)[None], outward=True))
+
+    faces = np.vstack([
+        _orient_horizontal(np.vstack(faces_up), vertices, up=True),
+        _orient_horizontal(np.vstack(faces_down), vertices, up=False),
+        np.vstack(faces_side)
+    ])
+
+    return trimesh.Trimesh(vertices=vertices, faces=faces, process=False)
@@ -1,31 +1,86 @@
-from flask import Flask, request, jsonify, send_file, send_from_directory
+import time
+_import_start = time.perf_counter()
+
+from flask import Flask, Response, request, jsonify, send_file, send_from_directory
 from flask_cors import CORS
-import trimesh
+import functools
+import gzip
+import hashlib
 import io
+import json
 import os
-import time
 
-from layouts import (
-    generate_checkerboard,
-    generate_hex_checkerboard,
-    generate_hex_honeycomb_layout,
-    generate_organic_hex_layout,
-    generate_voronoi_layout,
-    get_positions_from_square_layout,
-    get_positions_from_hex_layout,
-    get_positions_from_organic_layout
+from layouts import Layout, generate_layout, warmup_numba, warmup_status
+from geometry import get_bounds_from_positions
+from pipeline import (
+    resolve_generate_params,
+    apply_dimension_locks,
+    is_random_layout,
+    result_params,
+    stage_keys,
+    build_model,
+    stream_model,
+    export_model,
+    check_model,
+    ClearanceError,
+    ModelTooLarge,
+    GenerationCancelled
 )
+from preview_format import PREVIEW_MEDIA_TYPE, PREVIEW_VERSION, encode_preview
+from mesh_formats import MODEL_MEDIA_TYPES
+from stl_cache import cache_key, cache_get, cache_put, cache_stream
+from jobs import submit_job, job_status, cancel_job, job_result
+from batch import expand_batch, stream_batch
+from metrics import StageTimer, count, render_metrics, profile_call
+from stage_cache import memoize, stage_cache_stats
+from preview_index import build_preview_index, measurement_anchors, query_region
+from clearance import clearance_error
+from inflight import announce, single_flight, inflight_stats
+import voronoi_cache
 
-from geometry import (
-    create_pillars_from_positions,
-    get_bounds_from_positions,
-    create_floor_with_holes,
-    create_walls_from_bounds
-)
+IMPORT_SECONDS = time.perf_counter() - _import_start
+
+# Smallest /preview body worth compressing
+PREVIEW_COMPRESS_MIN_BYTES = 4096
 
 app = Flask(__name__, static_folder='.')
 CORS(app)
 
+# Compile the Lloyd kernel off the import path: 'background' (default),
+# 'eager' to block until it is ready, or 'lazy' for the first Voronoi request
+NUMBA_WARMUP = os.environ.get('PILLARS_NUMBA_WARMUP', 'background')
+if NUMBA_WARMUP != 'lazy':
+    warmup_numba(background=NUMBA_WARMUP == 'background')
+
+def _is_local():
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+def profiled(view):
+    """
+    Let local clients add ?profile=1 to get the request's cProfile stats
+    (marshalled, loadable with pstats.Stats) instead of its response
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.args.get('profile') not in ('1', 'true'):
+            return view(*args, **kwargs)
+        if not _is_local():
+            return jsonify({'error': 'profiling is only available locally'}), 403
+        
+        def run():
+            response = app.make_response(view(*args, **kwargs))
+            # Produce streamed and file bodies inside the profile
+            response.direct_passthrough = False
+            response.get_data()
+            return response
+        
+        response, stats = profile_call(run)
+        return Response(stats, mimetype='application/octet-stream', headers={
+            'Content-Disposition': 'attachment; filename=profile.pstats',
+            'Server-Timing': response.headers.get('Server-Timing', '')
+        })
+    return wrapper
+
 @app.route('/')
 def serve_index():
     return send_from_directory('.', 'index.html')
@@ -35,137 +90,458 @@ def serve_static(filename):
     # Serve any static file (.js, .css, etc.)
     return send_from_directory('.', filename)
 
+@app.route('/status', methods=['GET'])
+def status():
+    """Cold-start timings: backend import time and kernel warmup state"""
+    return jsonify({
+        'import_seconds': IMPORT_SECONDS,
+        'numba': warmup_status()
+    })
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Latency histograms and cache counters in Prometheus text format, local clients only"""
+    if not _is_local():
+        return jsonify({'error': 'metrics are only available locally'}), 403
+    
+    gauges = [
+        ('pillars_voronoi_cache_lookups_total', (('result', result),), value)
+        for result, value in sorted(voronoi_cache.stats().items())
+    ]
+    gauges += [
+        ('pillars_stage_cache_lookups_total', (('stage', stage), ('result', result)), value)
+        for stage, counts in sorted(stage_cache_stats().items())
+        for result, value in sorted(counts.items())
+    ]
+    gauges += [
+        ('pillars_preview_layouts_total', (('result', result),), value)
+        for result, value in sorted(inflight_stats().items())
+    ]
+    return Response(render_metrics(gauges), mimetype='text/plain; version=0.0.4')
+
+# Parameters of the clearance report sent with a preview, besides its positions
+_CLEARANCE_INPUTS = ('pillar_radius', 'hole_radius', 'min_clearance')
+
+def _preview_etag(params, media_type):
+    """ETag of a preview: its layout, padding and clearance parameters, or None if it is random"""
+    if is_random_layout(params):
+        return None
+    clearance = tuple(float(params[name]) for name in _CLEARANCE_INPUTS)
+    key = repr((stage_keys(params)['positions'], clearance, media_type, PREVIEW_VERSION))
+    return hashlib.sha256(key.encode()).hexdigest()
+
+def _compress(response):
+    """Gzip a response body if the client accepts it and it is worth it"""
+    data = response.get_data()
+    if len(data) >= PREVIEW_COMPRESS_MIN_BYTES and request.accept_encodings.best_match(['gzip']):
+        response.set_data(gzip.compress(data, compresslevel=1))
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.update(('Accept', 'Accept-Encoding'))
+    return response
+
+def _superseded():
+    count('pillars_preview_superseded_total')
+    return jsonify({'error': 'superseded by a later request'}), 409
+
+def _preview_tag():
+    """(session, sequence) of a tagged preview request, (None, None) otherwise"""
+    session = request.headers.get('X-Preview-Session')
+    sequence = request.headers.get('X-Preview-Sequence', type=int)
+    if sequence is None:
+        return None, None
+    return session, sequence
+
+def _preview_layout(params, session, sequence):
+    """
+    Layout for preview parameters, shared with concurrent identical requests
+    and stored in the stage cache for /check and /generate
+    """
+    key = stage_keys(params)['layout']
+    build = lambda: single_flight(key, lambda check: generate_layout(
+        params['layout_type'], params['rows'], params['cols'], params['spacing'],
+        params['hole_probability'], params['jitter'], params['lloyd_iterations'], params['seed'],
+        params['lloyd_tolerance'], on_iteration=check
+    ), session, sequence)
+    return build() if is_random_layout(params) else memoize(key, build)
+
+def _clearance_header(report):
+    return json.dumps(report, separators=(',', ':'))
+
 @app.route('/preview', methods=['POST'])
+@profiled
 def preview():
-    """Generate positions only for preview - lightweight, no 3D geometry"""
-    params = request.json
-    
-    layout_type = params.get('layout_type', 'hex-checkerboard')
-    rows = params.get('rows', 50)
-    cols = params.get('cols', 50)
-    spacing = params.get('spacing', 0.35)
-    floor_padding_x = params.get('floor_padding_x', 0.25)
-    floor_padding_y = params.get('floor_padding_y', 0.25)
+    """
+    Generate positions only for preview - lightweight, no 3D geometry
+
+    Sends packed float32 arrays (see preview_format) when the Accept header
+    prefers PREVIEW_MEDIA_TYPE, JSON otherwise. Clients that send back the
+    ETag in If-None-Match get 304 without the layout being recomputed.
+    With target_width / target_height the floor padding is solved from the
+    layout (see apply_dimension_locks), so bounds come back at the targets.
+    The X-Clearance header carries the layout's clearance report (see
+    /check) as JSON, so the page needs no second request for it.
+
+    Concurrent requests for the same layout share one computation. Requests
+    tagged with X-Preview-Session and X-Preview-Sequence headers are answered
+    409 once a later request of the session arrives, and a layout nobody is
+    waiting for any more stops relaxing at its next Lloyd iteration.
+    """
+    timer = StageTimer('preview')
+    try:
+        params = resolve_generate_params(request.json)
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    session, sequence = _preview_tag()
+    if not announce(session, sequence):
+        return _superseded()
+    media_type = request.accept_mimetypes.best_match(['application/json', PREVIEW_MEDIA_TYPE],
+                                                     default='application/json')
     
-    hole_probability = params.get('hole_probability', 0.2)
-    jitter = params.get('jitter', 0.075)
-    lloyd_iterations = params.get('lloyd_iterations', 0)
-    seed = params.get('seed', 42)
+    etag = _preview_etag(params, media_type)
+    if etag is not None and etag in request.if_none_match:
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
     
     # Get positions without creating 3D geometry
-    if layout_type == 'square-checkerboard':
-        layout = generate_checkerboard(rows, cols)
-        pillar_positions, hole_positions = get_positions_from_square_layout(layout, spacing)
-    elif layout_type == 'hex-checkerboard':
-        layout = generate_hex_checkerboard(rows, cols)
-        pillar_positions, hole_positions = get_positions_from_hex_layout(layout, spacing)
-    elif layout_type == 'hex-honeycomb':
-        layout = generate_hex_honeycomb_layout(rows, cols)
-        pillar_positions, hole_positions = get_positions_from_hex_layout(layout, spacing)
-    elif layout_type == 'organic':
-        positions = generate_organic_hex_layout(rows, cols, hole_probability, jitter, spacing, seed)
-        pillar_positions, hole_positions = get_positions_from_organic_layout(positions)
-    elif layout_type == 'voronoi':
-        positions = generate_voronoi_layout(rows, cols, hole_probability, spacing, lloyd_iterations, seed)
-        pillar_positions, hole_positions = get_positions_from_organic_layout(positions)
-    
-    all_positions = hole_positions + pillar_positions
-    min_x, max_x, min_y, max_y = get_bounds_from_positions(all_positions, padding_x=floor_padding_x, padding_y=floor_padding_y)
+    timer('layout')
+    try:
+        layout = _preview_layout(params, session, sequence)
+    except GenerationCancelled:
+        return _superseded()
     
-    return jsonify({
-        'pillars': [{'x': float(x), 'y': float(y)} for x, y in pillar_positions],
-        'holes': [{'x': float(x), 'y': float(y)} for x, y in hole_positions],
-        'bounds': {
-            'minX': float(min_x),
-            'maxX': float(max_x),
-            'minY': float(min_y),
-            'maxY': float(max_y)
-        }
-    })
+    timer('positions')
+    pillar_positions, hole_positions = layout.pillars, layout.holes
+    params = apply_dimension_locks(params, layout.positions)
+    bounds = get_bounds_from_positions(layout.positions, padding_x=params['floor_padding_x'],
+                                       padding_y=params['floor_padding_y'])
+    min_x, max_x, min_y, max_y = bounds
+    
+    timer('clearance')
+    clearance = check_model(params, layout)
+    
+    timer('serialize')
+    if media_type == PREVIEW_MEDIA_TYPE:
+        response = Response(encode_preview(pillar_positions, hole_positions, bounds), mimetype=PREVIEW_MEDIA_TYPE)
+    else:
+        response = jsonify({
+            'pillars': [{'x': x, 'y': y} for x, y in pillar_positions.tolist()],
+            'holes': [{'x': x, 'y': y} for x, y in hole_positions.tolist()],
+            'bounds': {
+                'minX': float(min_x),
+                'maxX': float(max_x),
+                'minY': float(min_y),
+                'maxY': float(max_y)
+            }
+        })
+    response = _compress(response)
+    if etag is not None:
+        response.set_etag(etag)
+    response.headers['X-Clearance'] = _clearance_header(clearance)
+    response.headers['Server-Timing'] = timer.server_timing()
+    timer.finish()
+    return response
+
+@app.route('/preview/region', methods=['POST'])
+@profiled
+def preview_region():
+    """
+    Visible part of a preview at one zoom level, for grids too large to send whole
+
+    Takes the /preview parameters plus view: {width, height, zoom}, the
+    canvas size in pixels and the zoom it is drawn at. The floor is framed
+    as Renderer._calculateTransform does, and the visible pillars and holes
+    are returned, or per-cell counts where they would be drawn below a pixel
+    (see preview_index.query_region), with the layout's counts, extent,
+    clearance report (see /check) and the measurement anchors nearest the
+    view center. The spatial index is built once per layout and kept in the
+    stage cache.
+    """
+    timer = StageTimer('preview_region')
+    try:
+        params = resolve_generate_params(request.json)
+        view = params.get('view') or {}
+        width, height = float(view['width']), float(view['height'])
+        zoom = float(view.get('zoom', 1.0))
+    except (ValueError, KeyError, TypeError) as error:
+        return jsonify({'error': f'invalid parameters: {error}'}), 400
+    session, sequence = _preview_tag()
+    if not announce(session, sequence):
+        return _superseded()
+    
+    timer('layout')
+    try:
+        build = lambda: build_preview_index(_preview_layout(params, session, sequence), params['spacing'])
+        # An unseeded random layout is a new draw, never a cached one
+        index = build() if is_random_layout(params) else memoize(
+            ('preview_index', stage_keys(params)['layout']), build
+        )
+    except GenerationCancelled:
+        return _superseded()
+    
+    timer('positions')
+    params = apply_dimension_locks(params, index.positions)
+    min_x, max_x, min_y, max_y = get_bounds_from_positions(
+        index.positions, padding_x=params['floor_padding_x'], padding_y=params['floor_padding_y']
+    )
+    wall_thickness = params['wall_thickness']
+    scale = min(width, height) * zoom / (max(max_x - min_x, max_y - min_y) + 2 * wall_thickness)
+    center_x, center_y = (min_x + max_x) / 2, (min_y + max_y) / 2
+    half_width, half_height = width / 2 / scale, height / 2 / scale
+    viewport = (center_x - half_width, center_x + half_width, center_y - half_height, center_y + half_height)
+    
+    timer('clearance')
+    layout = Layout(index.positions, index.is_pillar)
+    if is_random_layout(params):
+        clearance = check_model(params, layout)
+    else:
+        clearance_key = (stage_keys(params)['positions'], *(float(params[name]) for name in _CLEARANCE_INPUTS))
+        clearance = memoize(('preview_clearance', *clearance_key), lambda: check_model(params, layout))
+    
+    timer('region')
+    region = query_region(index, viewport, 1 / scale, params['pillar_radius'])
+    n_pillars = int(index.is_pillar.sum())
+    extent = dict(zip(('minX', 'maxX', 'minY', 'maxY'), index.extent))
+    
+    timer('serialize')
+    response = _compress(jsonify({
+        **region,
+        'bounds': {'minX': float(min_x), 'maxX': float(max_x), 'minY': float(min_y), 'maxY': float(max_y)},
+        'extent': extent,
+        'counts': {'pillars': n_pillars, 'holes': len(index.positions) - n_pillars},
+        'anchors': measurement_anchors(index, (center_x, center_y)),
+        'clearance': clearance
+    }))
+    response.headers['Server-Timing'] = timer.server_timing()
+    timer.finish()
+    return response
+
+@app.route('/check', methods=['POST'])
+@profiled
+def check_layout():
+    """
+    Manufacturability pre-check: pillar-pillar, pillar-hole and floor edge
+    clearances of a layout, without building any geometry
+
+    Takes the /generate parameters; min_clearance sets the smallest gap
+    allowed. Always answers 200 with the report (see
+    clearance.check_clearances), whose 'ok' tells whether /generate would
+    accept the parameters with clearance_check on.
+    """
+    timer = StageTimer('check')
+    try:
+        params = resolve_generate_params(request.json)
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    timer('check')
+    response = jsonify(check_model(params))
+    response.headers['Server-Timing'] = timer.server_timing()
+    timer.finish()
+    return response
+
+def _clearance_rejected(report):
+    count('pillars_clearance_rejected_total')
+    return jsonify({'error': clearance_error(report), 'clearance': report}), 422
+
+def _download_headers(path, metadata):
+    """Size and, when recorded, triangle count and export time of a cached model file"""
+    headers = {'X-Download-Size': str(os.path.getsize(path))}
+    if 'triangles' in metadata:
+        headers['X-Triangles'] = str(metadata['triangles'])
+    if 'export_time' in metadata:
+        headers['X-Export-Time'] = f"{metadata['export_time']:.2f}"
+    return headers
 
 @app.route('/generate', methods=['POST'])
+@profiled
 def generate_stl():
-    """Generate full STL file"""
+    """
+    Generate the full model
+
+    The format parameter picks STL, or GLB or 3MF, which store one pillar
+    mesh and its positions instead of every pillar's triangles. Streaming
+    only applies to STL, and is answered 413 for a model whose in-memory
+    mesh would exceed STREAM_MAX_TRIANGLES. Layouts failing the clearance
+    check (see /check) are answered 422 before any geometry is built,
+    unless clearance_check is false.
+    """
     start_time = time.time()
-    params = request.json
-    
-    layout_type = params.get('layout_type', 'hex-checkerboard')
-    rows = params.get('rows', 50)
-    cols = params.get('cols', 50)
-    spacing = params.get('spacing', 0.35)
-    pillar_radius = params.get('pillar_radius', 0.125)
-    pillar_height = params.get('pillar_height', 10.0)
-    hole_radius = params.get('hole_radius', 0.1)
-    floor_thickness = params.get('floor_thickness', 2.0)
-    floor_padding_x = params.get('floor_padding_x', 0.25)
-    floor_padding_y = params.get('floor_padding_y', 0.25)
-    wall_thickness = params.get('wall_thickness', 0.5)
-    
-    hole_probability = params.get('hole_probability', 0.2)
-    jitter = params.get('jitter', 0.075)
-    lloyd_iterations = params.get('lloyd_iterations', 0)
-    seed = params.get('seed', 42)
-    
-    # Generate layout and extract positions
-    if layout_type == 'square-checkerboard':
-        layout = generate_checkerboard(rows, cols)
-        pillar_positions, hole_positions = get_positions_from_square_layout(layout, spacing)
-    elif layout_type == 'hex-checkerboard':
-        layout = generate_hex_checkerboard(rows, cols)
-        pillar_positions, hole_positions = get_positions_from_hex_layout(layout, spacing)
-    elif layout_type == 'hex-honeycomb':
-        layout = generate_hex_honeycomb_layout(rows, cols)
-        pillar_positions, hole_positions = get_positions_from_hex_layout(layout, spacing)
-    elif layout_type == 'organic':
-        positions = generate_organic_hex_layout(rows, cols, hole_probability, jitter, spacing, seed)
-        pillar_positions, hole_positions = get_positions_from_organic_layout(positions)
-    elif layout_type == 'voronoi':
-        positions = generate_voronoi_layout(rows, cols, hole_probability, spacing, lloyd_iterations, seed)
-        pillar_positions, hole_positions = get_positions_from_organic_layout(positions)
-    
-    # Build geometry
-    pillars = create_pillars_from_positions(pillar_positions, pillar_radius, pillar_height, floor_thickness)
-    
-    all_positions = hole_positions + pillar_positions
-    min_x, max_x, min_y, max_y = get_bounds_from_positions(all_positions, padding_x=floor_padding_x, padding_y=floor_padding_y)
-    
-    floor = create_floor_with_holes(
-        holes=hole_positions,
-        floor_thickness=floor_thickness,
-        padding_x=floor_padding_x,
-        padding_y=floor_padding_y,
-        hole_radius=hole_radius,
-        bounds_positions=all_positions
-    )
+    timer = StageTimer('generate')
+    try:
+        params = resolve_generate_params(request.json)
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    if params['format'] != 'stl':
+        params['stream'] = False
+    # An unseeded random layout is new every time, so never cached
+    use_cache = params['cache'] and not is_random_layout(params)
+    mimetype = MODEL_MEDIA_TYPES[params['format']]
+    download_name = f"pillar_grid_{params['layout_type']}.{params['format']}"
     
-    walls = create_walls_from_bounds(
-        min_x, max_x, min_y, max_y,
-        wall_height=floor_thickness + pillar_height,
-        wall_thickness=wall_thickness
-    )
+    # Serve identical parameter sets straight from the STL cache
+    cache_status = 'BYPASS'
+    if use_cache:
+        timer('cache')
+        key = cache_key(result_params(params))
+        hit = cache_get(key)
+        if hit is not None:
+            path, metadata = hit
+            elapsed = time.time() - start_time
+            count('pillars_stl_cache_total', (('result', 'HIT'),))
+            server_timing = timer.server_timing()
+            timer.finish()
+            return send_file(
+                path,
+                mimetype=mimetype,
+                as_attachment=True,
+                download_name=download_name
+            ), 200, {
+                'X-Generation-Time': f'{elapsed:.2f}',
+                'X-Dimensions': metadata['dimensions'],
+                'X-Assembly': metadata['assembly'],
+                'X-Cache': 'HIT',
+                **_download_headers(path, metadata),
+                'Server-Timing': server_timing
+            }
+        cache_status = 'MISS'
+    count('pillars_stl_cache_total', (('result', cache_status),))
     
-    # Union all parts
-    model = trimesh.boolean.union([pillars, floor, walls])
+    try:
+        generated = build_model(params, timer)
+    except ClearanceError as error:
+        return _clearance_rejected(error.report)
+    except ModelTooLarge as error:
+        return jsonify({'error': str(error)}), 413
+    metadata = {'dimensions': generated.dimensions, 'assembly': generated.assembly,
+                'triangles': generated.triangles, 'format': params['format']}
     
-    # Get dimensions
-    bounds = model.bounds
-    size = bounds[1] - bounds[0]
+    if params['stream']:
+        # Stream the base mesh, then pillars batch by batch; direct assembly
+        # left the pillars out so they are never held in memory at once
+        content_length, body = stream_model(generated, params)
+        if use_cache:
+            body = cache_stream(key, body, metadata)
+        
+        # Export runs as the body is sent, after these headers
+        elapsed = time.time() - start_time
+        server_timing = timer.server_timing()
+        body = timer.finish_stream(body)
+        
+        return Response(
+            body,
+            mimetype='application/octet-stream',
+            headers={
+                'Content-Disposition': f'attachment; filename={download_name}',
+                'Content-Length': str(content_length),
+                'X-Download-Size': str(content_length),
+                'X-Generation-Time': f'{elapsed:.2f}',
+                'X-Dimensions': generated.dimensions,
+                'X-Triangles': str(generated.triangles),
+                'X-Assembly': generated.assembly,
+                'X-Cache': cache_status,
+                'Server-Timing': server_timing
+            }
+        )
     
     # Export to memory
-    output = io.BytesIO()
-    model.export(output, file_type='stl')
-    output.seek(0)
+    timer('export')
+    export_start = time.time()
+    data = export_model(generated, params)
+    metadata['export_time'] = time.time() - export_start
+    if use_cache:
+        cache_put(key, data, metadata)
     
     elapsed = time.time() - start_time
+    server_timing = timer.server_timing()
+    timer.finish()
     
     return send_file(
-        output,
-        mimetype='application/octet-stream',
+        io.BytesIO(data),
+        mimetype=mimetype,
         as_attachment=True,
-        download_name=f'pillar_grid_{layout_type}.stl'
+        download_name=download_name
     ), 200, {
         'X-Generation-Time': f'{elapsed:.2f}',
-        'X-Dimensions': f'{size[0]:.2f}x{size[1]:.2f}x{size[2]:.2f}'
+        'X-Export-Time': f"{metadata['export_time']:.2f}",
+        'X-Download-Size': str(len(data)),
+        'X-Dimensions': generated.dimensions,
+        'X-Triangles': str(generated.triangles),
+        'X-Assembly': generated.assembly,
+        'X-Cache': cache_status,
+        'Server-Timing': server_timing
+    }
+
+@app.route('/batch', methods=['POST'])
+def generate_batch():
+    """Generate a list or sweep of parameter sets, streamed back as a zip of STLs"""
+    try:
+        variants = expand_batch(request.json)
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    
+    return Response(
+        stream_batch(variants),
+        mimetype='application/zip',
+        headers={
+            'Content-Disposition': 'attachment; filename=pillar_grid_batch.zip',
+            'X-Batch-Variants': str(len(variants))
+        }
+    )
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Submit a model generation job; takes the same parameters as /generate"""
+    try:
+        params = resolve_generate_params(request.json)
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    if params['clearance_check']:
+        report = check_model(params)
+        if not report['ok']:
+            return _clearance_rejected(report)
+    job_id = submit_job(params)
+    return jsonify(job_status(job_id)), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Job status and current stage"""
+    status = job_status(job_id)
+    if status is None:
+        return jsonify({'error': 'unknown job'}), 404
+    return jsonify(status)
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def delete_job(job_id):
+    """Cancel a queued or running job"""
+    if job_status(job_id) is None:
+        return jsonify({'error': 'unknown job'}), 404
+    return jsonify({'job_id': job_id, 'cancelled': cancel_job(job_id)})
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """Download a finished job's model file"""
+    status = job_status(job_id)
+    if status is None:
+        return jsonify({'error': 'unknown job'}), 404
+    if status['status'] != 'done':
+        return jsonify({'error': f"job is {status['status']}"}), 409
+    
+    result = job_result(job_id)
+    if result is None:
+        return jsonify({'error': 'result expired'}), 410
+    
+    path, metadata = result
+    model_format = metadata.get('format', 'stl')
+    return send_file(
+        path,
+        mimetype=MODEL_MEDIA_TYPES[model_format],
+        as_attachment=True,
+        download_name=f'pillar_grid.{model_format}'
+    ), 200, {
+        'X-Generation-Time': f"{status['elapsed']:.2f}",
+        'X-Dimensions': metadata['dimensions'],
+        'X-Assembly': metadata['assembly'],
+        **_download_headers(path, metadata)
     }
 
 if __name__ == '__main__':
@@ -0,0 +1,214 @@
+import io
+import itertools
+import json
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from jobs import worker_pool
+from pipeline import (
+    build_layout,
+    build_model,
+    is_random_layout,
+    export_model,
+    result_params,
+    resolve_generate_params,
+    stage_keys
+)
+from stl_cache import cache_key, cache_get, cache_put
+
+# Parameter-sweep batch generation.
+#
+# A batch is expanded into variants, one resolved /generate parameter set
+# each. Variants that share a layout are grouped: the group's layout is
+# built once on the job worker pool, then the variants are built and
+# exported with that layout as tasks of their own, so a sweep over geometry
+# parameters runs on every core. Variants that also share a floor built as
+# a stage of its own (boolean assembly) run as one task, which builds the
+# floor once and reuses it from the worker's stage cache; direct and tiled
+# assembly build the floor inside the assembly stage, so there is nothing
+# to share. Every STL goes through the STL cache, which already-generated
+# variants are served from, and the zip archive is streamed entry by entry
+# as variants finish.
+
+MAX_BATCH_VARIANTS = 256
+ZIP_CHUNK_BYTES = 1024 ** 2
+
+
+def expand_batch(body):
+    """
+    Resolved parameter sets of a batch request
+
+    Args:
+        body: {'base': {...}, 'variants': [{...}, ...], 'sweep': {name: [values]}},
+            all optional. Each variant is merged over base, then crossed with
+            every combination of the sweep values.
+
+    Returns:
+        list of resolved /generate parameter dicts
+
+    Raises:
+        ValueError: for a malformed request or too many variants
+    """
+    body = body or {}
+    base = body.get('base') or {}
+    variants = body.get('variants') or [{}]
+    sweep = body.get('sweep') or {}
+    if not isinstance(base, dict) or not isinstance(variants, list) or not isinstance(sweep, dict):
+        raise ValueError("base and sweep must be objects and variants a list")
+    if not all(isinstance(v, dict) for v in variants):
+        raise ValueError("every variant must be an object")
+    if not all(isinstance(values, list) and values for values in sweep.values()):
+        raise ValueError("every sweep entry must be a non-empty list")
+
+    n_variants = len(variants)
+    for values in sweep.values():
+        n_variants *= len(values)
+    if n_variants > MAX_BATCH_VARIANTS:
+        raise ValueError(f"batch has {n_variants} variants, at most {MAX_BATCH_VARIANTS} are allowed")
+
+    names = list(sweep)
+    return [
+        resolve_generate_params({**base, **variant, **dict(zip(names, combination)), 'stream': False})
+        for variant in variants
+        for combination in itertools.product(*sweep.values())
+    ]
+
+def _error_message(error):
+    return str(error) or type(error).__name__
+
+def _build_variant(key, params, layout):
+    """
+    Build and cache one variant on a prebuilt layout
+
+    Returns:
+        (key, metadata or None, error message or None)
+    """
+    try:
+        generated = build_model(params, layout=layout)
+        export_start = time.time()
+        data = export_model(generated, params)
+        metadata = {'dimensions': generated.dimensions, 'assembly': generated.assembly,
+                    'triangles': generated.triangles,
+                    'format': params['format'], 'export_time': time.time() - export_start}
+        cache_put(key, data, metadata)
+        return key, metadata, None
+    except Exception as error:
+        return key, None, _error_message(error)
+
+
+def _build_variants(variants, layout):
+    """Worker entry point: build the (key, params) variants of one task in turn, see _build_variant"""
+    return [_build_variant(key, params, layout) for key, params in variants]
+
+def _variant_tasks(group):
+    """(key, params) variants of a layout group split into tasks, one per shared floor or variant"""
+    tasks = {}
+    for key, params in group:
+        shares_floor = params['assembly'] not in ('direct', 'tiled')
+        tasks.setdefault(stage_keys(params)['floor'] if shares_floor else key, []).append((key, params))
+    return tasks.values()
+
+
+class _ZipStream(io.RawIOBase):
+    """Write-only, non-seekable sink that hands out what was written so far"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _entry_name(index, params):
+    return f"pillar_grid_{index:03d}_{params['layout_type']}.{params['format']}"
+
+def stream_batch(variants):
+    """
+    Zip archive of every variant's STL as a byte generator
+
+    Entries are added as their variants finish, followed by manifest.json
+    with each variant's parameters, file name, dimensions and assembly, or
+    the error that stopped it. Closing the generator cancels queued work.
+    """
+    keys = [cache_key(result_params(params)) for params in variants]
+    manifest = [{'file': None, 'parameters': params} for params in variants]
+    indices = {}
+    for index, key in enumerate(keys):
+        indices.setdefault(key, []).append(index)
+
+    # Unique uncached variants, grouped by their layout; an unseeded random
+    # layout is a draw of its own for every variant
+    groups = {}
+    ready = []
+    for key, (first, *_) in indices.items():
+        hit = cache_get(key)
+        if hit is not None:
+            ready.append((key, hit[1], None))
+            continue
+        params = variants[first]
+        group = key if is_random_layout(params) else stage_keys(params)['layout']
+        groups.setdefault(group, []).append((key, params))
+
+    sink = _ZipStream()
+    archive = zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=1)
+    pool = worker_pool()
+    # future -> the group waiting on its layout, or None for a variant task
+    pending = {pool.submit(build_layout, group[0][1]): group for group in groups.values()}
+    try:
+        def finished():
+            yield from ready
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    group = pending.pop(future)
+                    if group is None:
+                        yield from future.result()
+                        continue
+                    try:
+                        layout = future.result()
+                    except Exception as error:
+                        yield from ((key, None, _error_message(error)) for key, _ in group)
+                        continue
+                    for task in _variant_tasks(group):
+                        pending[pool.submit(_build_variants, task, layout)] = None
+
+        for key, metadata, error in finished():
+            hit = cache_get(key) if error is None else None
+            if error is None and hit is None:
+                error = 'result evicted from the STL cache'
+            for index in indices[key]:
+                if error is not None:
+                    manifest[index]['error'] = error
+                    continue
+                name = _entry_name(index, variants[index])
+                manifest[index].update(file=name, **metadata)
+                with open(hit[0], 'rb') as source, archive.open(name, 'w', force_zip64=True) as entry:
+                    while True:
+                        chunk = source.read(ZIP_CHUNK_BYTES)
+                        if not chunk:
+                            break
+                        entry.write(chunk)
+                        yield sink.take()
+            yield sink.take()
+
+        archive.writestr('manifest.json', json.dumps(manifest, indent=1))
+        archive.close()
+        yield sink.take()
+    finally:
+        for future in pending:
+            future.cancel()
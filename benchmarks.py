@@ -0,0 +1,230 @@
+"""
+Benchmarks for the layout generators, geometry builders and endpoints
+
+Every benchmark runs on square grids (rows = cols = size) and records the
+best and mean wall time over --repeat runs plus the peak traced Python/NumPy
+allocation of one extra run. The Voronoi and stage caches are cleared
+before every run and /generate bypasses the STL cache, so each run is
+cold. Once a run exceeds --budget seconds the benchmark's larger sizes are
+skipped.
+
+    python benchmarks.py
+    python benchmarks.py --sizes 10 100 --only layout --output before.json
+    python benchmarks.py --compare before.json after.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault('PILLARS_NUMBA_WARMUP', 'eager')
+os.environ.setdefault('PILLARS_VORONOI_CACHE_DIR', '')
+
+import numpy as np
+
+import layouts
+import geometry
+import stage_cache
+import voronoi_cache
+from backend import app
+
+DEFAULT_SIZES = (10, 50, 100, 200, 300, 500)
+SPACING = 0.35
+PILLAR_RADIUS = 0.125
+PILLAR_HEIGHT = 10.0
+HOLE_RADIUS = 0.1
+FLOOR_THICKNESS = 2.0
+PADDING = 0.25
+
+
+def _layout(size):
+    return layouts.generate_layout('hex-checkerboard', size, size, SPACING)
+
+def _bounds(size):
+    return geometry.get_bounds_from_positions(_layout(size).positions, PADDING, PADDING)
+
+def _organic_tuples(size):
+    layout = layouts.generate_organic_hex_layout(size, size, 0.2, 0.075, SPACING, 42)
+    return [(x, y, p) for (x, y), p in zip(layout.positions.tolist(), layout.is_pillar.tolist())]
+
+def _post(path, size, **params):
+    def run():
+        response = app.test_client().post(path, json={'rows': size, 'cols': size, **params})
+        assert response.status_code == 200, response.status_code
+        response.get_data()
+    return run
+
+# name -> (group, setup(size) returning the zero-argument callable to time)
+BENCHMARKS = {
+    'generate_checkerboard': ('layout', lambda n: lambda: layouts.generate_checkerboard(n, n)),
+    'generate_hex_checkerboard': ('layout', lambda n: lambda: layouts.generate_hex_checkerboard(n, n)),
+    'generate_hex_honeycomb_layout': ('layout', lambda n: lambda: layouts.generate_hex_honeycomb_layout(n, n)),
+    'generate_organic_hex_layout': ('layout', lambda n: lambda: layouts.generate_organic_hex_layout(
+        n, n, 0.2, 0.075, SPACING, 42)),
+    'generate_voronoi_layout': ('layout', lambda n: lambda: layouts.generate_voronoi_layout(
+        n, n, 0.2, SPACING, 0, 42)),
+    'generate_voronoi_layout[lloyd=5]': ('layout', lambda n: lambda: layouts.generate_voronoi_layout(
+        n, n, 0.2, SPACING, 5, 42)),
+    'get_positions_from_square_layout': ('layout', lambda n: (
+        lambda mask: lambda: layouts.get_positions_from_square_layout(mask, SPACING)
+    )(layouts.generate_checkerboard(n, n))),
+    'get_positions_from_hex_layout': ('layout', lambda n: (
+        lambda mask: lambda: layouts.get_positions_from_hex_layout(mask, SPACING)
+    )(layouts.generate_hex_checkerboard(n, n))),
+    'get_positions_from_organic_layout': ('layout', lambda n: (
+        lambda tuples: lambda: layouts.get_positions_from_organic_layout(tuples)
+    )(_organic_tuples(n))),
+    'create_pillars_from_positions': ('geometry', lambda n: (
+        lambda pillars: lambda: geometry.create_pillars_from_positions(
+            pillars, PILLAR_RADIUS, PILLAR_HEIGHT, FLOOR_THICKNESS)
+    )(_layout(n).pillars)),
+    'create_floor_with_holes': ('geometry', lambda n: (
+        lambda layout: lambda: geometry.create_floor_with_holes(
+            layout.holes, FLOOR_THICKNESS, PADDING, PADDING, HOLE_RADIUS,
+            bounds_positions=layout.positions, tile_size=5.0)
+    )(_layout(n))),
+    'create_walls_from_bounds': ('geometry', lambda n: (
+        lambda bounds: lambda: geometry.create_walls_from_bounds(
+            *bounds, wall_height=FLOOR_THICKNESS + PILLAR_HEIGHT, wall_thickness=0.5)
+    )(_bounds(n))),
+    '/preview': ('endpoint', lambda n: _post('/preview', n)),
+    '/preview[voronoi]': ('endpoint', lambda n: _post('/preview', n, layout_type='voronoi', lloyd_iterations=5)),
+    '/check[organic]': ('endpoint', lambda n: _post('/check', n, layout_type='organic')),
+    '/generate': ('endpoint', lambda n: _post('/generate', n, cache=False)),
+    '/generate[stream]': ('endpoint', lambda n: _post('/generate', n, cache=False, stream=True)),
+}
+
+
+def _clear_caches():
+    voronoi_cache.clear(disk=False)
+    stage_cache.clear_stage_cache()
+
+def _time(fn):
+    _clear_caches()
+    gc.collect()
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+def _peak_bytes(fn):
+    _clear_caches()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def run_benchmarks(names, sizes, repeat=3, budget=60.0, memory=True, log=sys.stderr):
+    """
+    Run benchmarks over grid sizes
+
+    Returns:
+        list of result dicts, one per (benchmark, size), sizes that were
+        skipped after exceeding the budget marked 'skipped'
+    """
+    results = []
+    for name in names:
+        group, setup = BENCHMARKS[name]
+        over_budget = False
+        for size in sizes:
+            result = {'name': name, 'group': group, 'size': size}
+            if over_budget:
+                results.append({**result, 'skipped': True})
+                continue
+
+            fn = setup(size)
+            times = []
+            for _ in range(repeat):
+                times.append(_time(fn))
+                if times[-1] > budget:
+                    over_budget = True
+                    break
+            result.update(best=min(times), mean=sum(times) / len(times), runs=len(times))
+            if memory and not over_budget:
+                result['peak_bytes'] = _peak_bytes(fn)
+            results.append(result)
+
+            peak = result.get('peak_bytes')
+            peak = f'{peak / 1024 ** 2:9.1f} MB' if peak is not None else ''
+            print(f'{name:40s} {size:5d} {result["best"]:10.4f} s {peak}', file=log)
+    return results
+
+def _environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        'commit': commit or None,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'numba': layouts.NUMBA_AVAILABLE,
+        'cpu_count': os.cpu_count(),
+        'platform': platform.platform()
+    }
+
+def compare(before_path, after_path, out=sys.stdout):
+    """Print the best-time and peak-memory ratio of every benchmark in both files"""
+    with open(before_path) as f:
+        before = {(r['name'], r['size']): r for r in json.load(f)['results'] if not r.get('skipped')}
+    with open(after_path) as f:
+        after = [r for r in json.load(f)['results'] if not r.get('skipped')]
+
+    print(f'{"benchmark":40s} {"size":>5s} {"before":>10s} {"after":>10s} {"time":>7s} {"memory":>7s}', file=out)
+    for result in after:
+        old = before.get((result['name'], result['size']))
+        if old is None:
+            continue
+        time_ratio = result['best'] / old['best'] if old['best'] else float('nan')
+        memory_ratio = ''
+        if old.get('peak_bytes') and result.get('peak_bytes') is not None:
+            memory_ratio = f'{result["peak_bytes"] / old["peak_bytes"]:6.2f}x'
+        print(f'{result["name"]:40s} {result["size"]:5d} {old["best"]:10.4f} {result["best"]:10.4f} '
+              f'{time_ratio:6.2f}x {memory_ratio:>7s}', file=out)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='grid sizes (rows = cols)')
+    parser.add_argument('--only', nargs='+', help='benchmark names or groups (layout, geometry, endpoint)')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per size')
+    parser.add_argument('--budget', type=float, default=60.0,
+                        help='skip larger sizes once a run takes longer than this many seconds')
+    parser.add_argument('--no-memory', action='store_true', help='skip the peak memory run')
+    parser.add_argument('--output', help='write JSON results to this file instead of stdout')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='compare two result files')
+    parser.add_argument('--list', action='store_true', help='list benchmark names')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, (group, _) in BENCHMARKS.items():
+            print(f'{group:10s} {name}')
+        return
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    names = [name for name, (group, _) in BENCHMARKS.items()
+             if not args.only or name in args.only or group in args.only]
+    unknown = set(args.only or ()) - set(BENCHMARKS) - {group for group, _ in BENCHMARKS.values()}
+    if unknown:
+        parser.error(f'unknown benchmarks: {", ".join(sorted(unknown))}')
+
+    results = run_benchmarks(names, sorted(args.sizes), args.repeat, args.budget, not args.no_memory)
+    report = {'environment': _environment(), 'sizes': sorted(args.sizes), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+        print()
+
+if __name__ == '__main__':
+    main()
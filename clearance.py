@@ -0,0 +1,91 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+# Manufacturability pre-check.
+#
+# Catches layouts the mesh stages would spend their time on only to produce
+# a bad part: pillars overlapping each other (jittered organic layouts,
+# Voronoi sites closer than two pillar radii), pillars cutting into holes,
+# and circles running past the floor edge into the walls. Nearest neighbours
+# come from KD-trees over the positions, so the check is O(n log n) and runs
+# in milliseconds next to minutes of mesh generation.
+
+# Check name -> what is measured, for error messages
+CLEARANCE_CHECKS = {
+    'pillar_pillar': 'pillar to pillar',
+    'pillar_hole': 'pillar to hole',
+    'edge': 'pillar or hole to floor edge'
+}
+
+
+def _nearest_gaps(tree_points, query_points, k):
+    """Distance from every query point to its k-th nearest tree point, inf if there is none"""
+    if len(tree_points) < k or not len(query_points):
+        return np.full(len(query_points), np.inf)
+    distance, _ = cKDTree(tree_points).query(query_points, k=k)
+    return distance if k == 1 else distance[:, k - 1]
+
+def _summary(gaps, positions, min_clearance):
+    """Worst gap of a check, where it is, and how many positions fall short"""
+    short = gaps < min_clearance
+    if not len(gaps) or not np.isfinite(gaps).any():
+        return {'ok': True, 'violations': 0, 'min_gap': None, 'at': None}
+    worst = int(np.argmin(gaps))
+    return {
+        'ok': not short.any(),
+        'violations': int(np.count_nonzero(short)),
+        'min_gap': round(float(gaps[worst]), 9),
+        'at': positions[worst].tolist()
+    }
+
+def check_clearances(pillars, holes, floor_bounds, pillar_radius, hole_radius, min_clearance=0.0):
+    """
+    Clearances between the circles of a layout and to the floor edge
+
+    Args:
+        pillars, holes: (N, 2) center positions
+        floor_bounds: (min_x, max_x, min_y, max_y) of the floor inside the walls
+        min_clearance: smallest allowed gap in mm; touching circles pass at 0
+
+    Returns:
+        dict with 'ok', the 'min_clearance' used, and per check in
+        CLEARANCE_CHECKS: 'ok', 'violations' (positions closer than
+        min_clearance), 'min_gap' (the smallest gap, negative for an
+        overlap; None if there is nothing to measure) and 'at' (the
+        position with that gap)
+    """
+    pillars = np.asarray(pillars, dtype=float).reshape(-1, 2)
+    holes = np.asarray(holes, dtype=float).reshape(-1, 2)
+    min_x, max_x, min_y, max_y = floor_bounds
+
+    # Counted once per pillar, so an overlapping pair is two violations
+    pillar_gaps = _nearest_gaps(pillars, pillars, k=2) - 2 * pillar_radius
+    hole_gaps = _nearest_gaps(holes, pillars, k=1) - (pillar_radius + hole_radius)
+
+    positions = np.concatenate([pillars, holes])
+    radii = np.repeat([pillar_radius, hole_radius], [len(pillars), len(holes)])
+    edge_gaps = np.min([
+        positions[:, 0] - min_x, max_x - positions[:, 0],
+        positions[:, 1] - min_y, max_y - positions[:, 1]
+    ], axis=0) - radii if len(positions) else np.empty(0)
+
+    checks = {
+        'pillar_pillar': _summary(pillar_gaps, pillars, min_clearance),
+        'pillar_hole': _summary(hole_gaps, pillars, min_clearance),
+        'edge': _summary(edge_gaps, positions, min_clearance)
+    }
+    return {
+        'ok': all(check['ok'] for check in checks.values()),
+        'min_clearance': min_clearance,
+        **checks
+    }
+
+def clearance_error(report):
+    """One-line description of the failed checks of a report"""
+    failed = [
+        f"{CLEARANCE_CHECKS[name]} gap {report[name]['min_gap']:.3f} mm at "
+        f"({report[name]['at'][0]:.3f}, {report[name]['at'][1]:.3f}), "
+        f"{report[name]['violations']} below {report['min_clearance']:g} mm"
+        for name in CLEARANCE_CHECKS if not report[name]['ok']
+    ]
+    return 'clearance check failed: ' + '; '.join(failed)
@@ -113,11 +113,15 @@ const Exporter = {
     },
     
     _formatParametersText(parameters, previewData) {
+        const counts = previewData && (previewData.counts || {
+            pillars: (previewData.pillars || []).length,
+            holes: (previewData.holes || []).length
+        });
         const stats = previewData ? {
-            pillars: previewData.pillars || [],
-            holes: previewData.holes || [],
+            pillarCount: counts.pillars,
+            holeCount: counts.holes,
             bounds: previewData.bounds || {}
-        } : { pillars: [], holes: [], bounds: {} };
+        } : { pillarCount: 0, holeCount: 0, bounds: {} };
         
         const innerWidth = stats.bounds.maxX ? 
             (stats.bounds.maxX - stats.bounds.minX).toFixed(3) : 'N/A';
@@ -167,10 +171,10 @@ Hole Probability: ${parameters.holeProb} (0.0 to 1.0)
 Random Seed: ${parameters.seed}
 
 === STATISTICS ===
-Total Pillars: ${stats.pillars.length}
-Total Holes: ${stats.holes.length}
+Total Pillars: ${stats.pillarCount}
+Total Holes: ${stats.holeCount}
 Pillar Density: ${innerWidth !== 'N/A' && innerHeight !== 'N/A' ? 
-    (stats.pillars.length / (parseFloat(innerWidth) * parseFloat(innerHeight))).toFixed(4) : 'N/A'} pillars/mm²
+    (stats.pillarCount / (parseFloat(innerWidth) * parseFloat(innerHeight))).toFixed(4) : 'N/A'} pillars/mm²
 
 === NOTES ===
 - Spacing is measured center-to-center between adjacent pillars
@@ -1,21 +1,35 @@
 import numpy as np
+import shapely
 import trimesh
-from shapely.geometry import Polygon, Point
+from shapely.geometry import Polygon, box
+from shapely.geometry.polygon import orient
 from typing import List, Tuple
 
 def create_pillar(radius=0.5, height=4.0, sections=32):
     return trimesh.creation.cylinder(radius=radius, height=height, sections=sections)
 
-def create_pillars_from_positions(positions: List[Tuple[float, float]], radius=0.5, height=4.0, floor_thickness=0.0):
-    """Create pillar geometry from a list of (x, y) positions"""
-    pillars = []
-    
-    for x, y in positions:
-        pillar = create_pillar(radius, height)
-        pillar.apply_translation([x, y, floor_thickness + height / 2])
-        pillars.append(pillar)
+def instance_mesh(template: trimesh.Trimesh, positions, z=0.0):
+    """
+    Copy one template mesh to every (x, y) position in a single broadcast
+
+    Returns:
+        vertices: (N * V, 3) array, one block of template vertices per position
+        faces: (N * F, 3) array with indices offset per block
+    """
+    positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+    offsets = np.column_stack([positions, np.full(len(positions), z)])
     
-    return trimesh.util.concatenate(pillars)
+    vertices = (template.vertices[None, :, :] + offsets[:, None, :]).reshape(-1, 3)
+    index_offsets = np.arange(len(positions)) * len(template.vertices)
+    faces = (template.faces[None, :, :] + index_offsets[:, None, None]).reshape(-1, 3)
+    return vertices, faces
+
+def create_pillars_from_positions(positions: List[Tuple[float, float]], radius=0.5, height=4.0, floor_thickness=0.0,
+                                  sections=32):
+    """Create pillar geometry from a list of (x, y) positions"""
+    template = create_pillar(radius, height, sections)
+    vertices, faces = instance_mesh(template, positions, z=floor_thickness + height / 2)
+    return trimesh.Trimesh(vertices=vertices, faces=faces, process=False)
 
 def get_bounds_from_positions(positions: List[Tuple[float, float]], padding_x=0.0, padding_y=0.0):
     positions = np.array(positions)
@@ -23,9 +37,146 @@ def get_bounds_from_positions(positions: List[Tuple[float, float]], padding_x=0.
     max_x, max_y = positions.max(axis=0)
     return min_x - padding_x, max_x + padding_x, min_y - padding_y, max_y + padding_y
 
-def create_floor_with_holes(holes: List[Tuple[float, float]], floor_thickness, padding_x, padding_y, hole_radius, bounds_positions=None):
-    positions_for_bounds = bounds_positions if bounds_positions else holes
+def hole_circles(holes, hole_radius, sections=64):
+    """Footprint polygons of the holes, with vertices where assemble_model puts them"""
+    holes = np.asarray(holes, dtype=float).reshape(-1, 2)
+    angles = 2 * np.pi * np.arange(sections) / sections
+    circle = np.column_stack([np.cos(angles), np.sin(angles)])
+    return shapely.polygons(holes[:, None, :] + hole_radius * circle)
+
+def extrude_polygons(geometry, height):
+    """
+    Extrude a polygon or multipolygon into one watertight mesh
+
+    Caps use a constrained Delaunay triangulation, which keeps every ring
+    vertex (earcut drops collinear ones), and side walls are built from the
+    polygon rings, so caps and walls share all of their vertices.
+    """
+    triangles, walls = [], []
+    for part in getattr(geometry, 'geoms', [geometry]):
+        if part.is_empty or part.geom_type != 'Polygon':
+            continue
+        part = orient(part, 1.0)
+        cells = shapely.get_parts(shapely.constrained_delaunay_triangles(part))
+        triangles.append(shapely.get_coordinates(shapely.get_exterior_ring(cells)).reshape(-1, 4, 2)[:, :3])
+        for ring in [part.exterior, *part.interiors]:
+            ring = np.asarray(ring.coords)
+            walls.append(np.stack([ring[:-1], ring[1:]], axis=1))
+    
+    triangles, walls = np.concatenate(triangles), np.concatenate(walls)
+    xy, index = np.unique(np.vstack([triangles.reshape(-1, 2), walls.reshape(-1, 2)]), axis=0, return_inverse=True)
+    index = index.reshape(-1)
+    n = len(xy)
+    
+    caps = index[:triangles.size // 2].reshape(-1, 3)
+    tri = xy[caps]
+    cross = ((tri[:, 1, 0] - tri[:, 0, 0]) * (tri[:, 2, 1] - tri[:, 0, 1]) -
+             (tri[:, 1, 1] - tri[:, 0, 1]) * (tri[:, 2, 0] - tri[:, 0, 0]))
+    caps[cross < 0] = caps[cross < 0][:, ::-1]
+    
+    a, b = index[triangles.size // 2:].reshape(-1, 2).T
+    vertices = np.vstack([
+        np.column_stack([xy, np.zeros(n)]),
+        np.column_stack([xy, np.full(n, height)])
+    ])
+    faces = np.vstack([
+        caps[:, ::-1],
+        caps + n,
+        np.column_stack([a, b, b + n]),
+        np.column_stack([a, b + n, a + n])
+    ])
+    return trimesh.Trimesh(vertices=vertices, faces=faces, process=False)
+
+def _extrude_tiled(circles, bounds, floor_thickness, tile_size):
+    """
+    Extrude the floor tile by tile so each triangulation stays small
+
+    Caps are triangulated per tile (constrained Delaunay, as in
+    extrude_polygons), side walls are built from every tile
+    edge that is not an internal seam, and shared seam vertices are merged
+    so the result is a single watertight slab.
+    """
+    min_x, max_x, min_y, max_y = bounds
+    x_edges = np.r_[np.arange(min_x, max_x, tile_size), max_x]
+    y_edges = np.r_[np.arange(min_y, max_y, tile_size), max_y]
+    tree = shapely.STRtree(circles)
+    
+    points, faces, walls = [], [], []
+    count = 0
+    for x0, x1 in zip(x_edges[:-1], x_edges[1:]):
+        for y0, y1 in zip(y_edges[:-1], y_edges[1:]):
+            tile = box(x0, y0, x1, y1)
+            tile = tile.difference(shapely.union_all(circles[tree.query(tile)]))
+            
+            for part in getattr(tile, 'geoms', [tile]):
+                if part.is_empty or part.geom_type != 'Polygon':
+                    continue
+                part = orient(part, 1.0)
+                # Constrained Delaunay keeps collinear ring vertices the walls use
+                cells = shapely.get_parts(shapely.constrained_delaunay_triangles(part))
+                v = shapely.get_coordinates(shapely.get_exterior_ring(cells)).reshape(-1, 4, 2)[:, :3]
+                points.append(v.reshape(-1, 2))
+                faces.append(count + np.arange(v.size // 2).reshape(-1, 3))
+                count += v.size // 2
+                
+                for ring in [part.exterior, *part.interiors]:
+                    ring = np.asarray(ring.coords)
+                    a, b = ring[:-1], ring[1:]
+                    seam = np.zeros(len(a), dtype=bool)
+                    for axis, lo, hi, edge in ((0, x0, x1, min_x), (0, x1, x0, max_x),
+                                               (1, y0, y1, min_y), (1, y1, y0, max_y)):
+                        if lo != edge:
+                            seam |= (a[:, axis] == lo) & (b[:, axis] == lo)
+                    walls.append(np.stack([a[~seam], b[~seam]], axis=1))
+    
+    walls = np.concatenate(walls)
+    all_points = np.vstack(points + [walls.reshape(-1, 2)])
+    
+    # Merge coincident seam vertices
+    tol = 1e-9 * max(max_x - min_x, max_y - min_y, 1.0)
+    kx = np.round((all_points[:, 0] - min_x) / tol).astype(np.int64)
+    ky = np.round((all_points[:, 1] - min_y) / tol).astype(np.int64)
+    _, first, index = np.unique(kx * (ky.max() + 1) + ky, return_index=True, return_inverse=True)
+    xy = all_points[first]
+    n = len(xy)
+    
+    caps = index[np.vstack(faces)]
+    tri = xy[caps]
+    cross = ((tri[:, 1, 0] - tri[:, 0, 0]) * (tri[:, 2, 1] - tri[:, 0, 1]) -
+             (tri[:, 1, 1] - tri[:, 0, 1]) * (tri[:, 2, 0] - tri[:, 0, 0]))
+    caps[cross < 0] = caps[cross < 0][:, ::-1]
+    
+    a, b = index[count:].reshape(-1, 2).T
+    vertices = np.vstack([
+        np.column_stack([xy, np.zeros(n)]),
+        np.column_stack([xy, np.full(n, floor_thickness)])
+    ])
+    faces = np.vstack([
+        caps[:, ::-1],
+        caps + n,
+        np.column_stack([a, b, b + n]),
+        np.column_stack([a, b + n, a + n])
+    ])
+    # A hole vertex on a seam can come back from the tile cut as two points
+    # within the merge tolerance; drop the slivers that collapse with them
+    faces = faces[(faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 0] != faces[:, 2])]
+    return trimesh.Trimesh(vertices=vertices, faces=faces, process=False)
+
+def create_floor_with_holes(holes: List[Tuple[float, float]], floor_thickness, padding_x, padding_y, hole_radius,
+                            bounds_positions=None, tile_size=None, sections=64):
+    """
+    Create the floor slab with all holes subtracted in one bulk operation
+
+    Args:
+        tile_size: if given, triangulate the slab in square tiles of this size
+        sections: segments per hole circle
+    """
+    positions_for_bounds = bounds_positions if bounds_positions is not None else holes
     min_x, max_x, min_y, max_y = get_bounds_from_positions(positions_for_bounds, padding_x, padding_y)
+    circles = hole_circles(holes, hole_radius, sections)
+    
+    if tile_size:
+        return _extrude_tiled(circles, (min_x, max_x, min_y, max_y), floor_thickness, tile_size)
     
     floor_outline = Polygon([
         (min_x, min_y),
@@ -33,9 +184,7 @@ def create_floor_with_holes(holes: List[Tuple[float, float]], floor_thickness, p
         (max_x, max_y),
         (min_x, max_y)
     ])
-    
-    for x, y in holes:
-        floor_outline = floor_outline.difference(Point(x, y).buffer(hole_radius))
+    floor_outline = floor_outline.difference(shapely.union_all(circles))
     
     floor = trimesh.creation.extrude_polygon(floor_outline, floor_thickness)
     return floor
@@ -0,0 +1,105 @@
+import threading
+from collections import OrderedDict
+
+from pipeline import GenerationCancelled
+
+# Coalescing of in-flight computations.
+#
+# Concurrent requests for the same key wait on one computation instead of
+# each running it. Requests may be tagged with a client session and a
+# sequence number that grows with every request of that session; once a
+# newer request of the same session arrives the older one is superseded,
+# and a computation whose every waiter has been superseded is abandoned at
+# its next check.
+
+MAX_SESSIONS = 1024
+
+_lock = threading.Lock()
+_latest = OrderedDict()  # session -> highest sequence number seen
+_flights = {}  # key -> _Flight
+_stats = {'computed': 0, 'coalesced': 0, 'abandoned': 0}
+
+
+class _Flight:
+    """One running computation and the requests waiting on it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.waiters = []  # (session, sequence); untagged waiters are (None, None)
+        self.result = None
+        self.error = None
+
+
+def _superseded(session, sequence):
+    return session is not None and _latest.get(session, sequence) > sequence
+
+def announce(session, sequence):
+    """
+    Record a tagged request, superseding the session's older ones
+
+    Returns:
+        False if a newer request of the session was already seen
+    """
+    if session is None:
+        return True
+    with _lock:
+        latest = max(_latest.pop(session, sequence), sequence)
+        _latest[session] = latest
+        while len(_latest) > MAX_SESSIONS:
+            _latest.popitem(last=False)
+        return latest == sequence
+
+def single_flight(key, compute, session=None, sequence=None):
+    """
+    Result of compute, shared with concurrent callers passing the same key
+
+    Args:
+        key: hashable identity of the computation
+        compute: called with a check function, which raises
+            GenerationCancelled once every waiting request has been
+            superseded; the computation should call it between steps
+        session, sequence: request tag (see announce), or None
+
+    Raises:
+        GenerationCancelled: if the computation was abandoned
+    """
+    with _lock:
+        flight = _flights.get(key)
+        owner = flight is None
+        if owner:
+            flight = _flights[key] = _Flight()
+        flight.waiters.append((session, sequence))
+        _stats['computed' if owner else 'coalesced'] += 1
+
+    if not owner:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def check():
+        with _lock:
+            if not all(_superseded(*waiter) for waiter in flight.waiters):
+                return
+            # Later requests for the key start a new computation
+            if _flights.get(key) is flight:
+                del _flights[key]
+            _stats['abandoned'] += 1
+        raise GenerationCancelled(key)
+
+    try:
+        flight.result = compute(check)
+        return flight.result
+    except BaseException as error:
+        flight.error = error
+        raise
+    finally:
+        with _lock:
+            if _flights.get(key) is flight:
+                del _flights[key]
+        flight.done.set()
+
+def inflight_stats():
+    """Computations run, requests that joined a running one, and computations abandoned"""
+    with _lock:
+        return dict(_stats)
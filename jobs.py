@@ -0,0 +1,166 @@
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from pipeline import (
+    STAGES,
+    GenerationCancelled,
+    build_model,
+    export_model,
+    result_params
+)
+from stl_cache import cache_key, cache_get, cache_put
+
+# Asynchronous STL generation jobs.
+#
+# Jobs run in a process pool sized to the available cores. Workers report
+# their current stage and check for cancellation through manager-backed
+# dicts shared with this process, and store finished STLs in the STL cache,
+# from which results are served.
+
+JOB_RETENTION_SECONDS = 3600
+
+_executor = None
+_manager = None
+_progress = None  # job_id -> current stage name
+_cancelled = None  # job_id -> True once cancellation is requested
+_jobs = {}
+_jobs_lock = threading.Lock()
+_pool_lock = threading.Lock()
+
+def _pool():
+    """Create the worker pool on first use"""
+    global _executor, _manager, _progress, _cancelled
+    with _pool_lock:
+        if _executor is None:
+            context = multiprocessing.get_context('spawn')
+            _manager = context.Manager()
+            _progress = _manager.dict()
+            _cancelled = _manager.dict()
+            _executor = ProcessPoolExecutor(max_workers=os.cpu_count() or 1, mp_context=context)
+        return _executor
+
+def worker_pool():
+    """The generation worker pool, shared with other batch work"""
+    return _pool()
+
+def _run_job(job_id, params, key, progress, cancelled):
+    """Worker entry point: build, export and cache one model file"""
+    def stage(name):
+        if cancelled.get(job_id):
+            raise GenerationCancelled(job_id)
+        progress[job_id] = name
+
+    # Results are written whole, never streamed
+    params = {**params, 'stream': False}
+    generated = build_model(params, stage)
+    stage('export')
+    export_start = time.time()
+    data = export_model(generated, params)
+    metadata = {'dimensions': generated.dimensions, 'assembly': generated.assembly,
+                'triangles': generated.triangles,
+                'format': params['format'], 'export_time': time.time() - export_start}
+    cache_put(key, data, metadata)
+    return metadata
+
+def _prune_finished():
+    now = time.time()
+    for job_id, job in list(_jobs.items()):
+        finished = job['future'] is None or job['future'].done()
+        if finished and now - job['submitted'] > JOB_RETENTION_SECONDS:
+            del _jobs[job_id]
+            if _progress is not None:
+                _progress.pop(job_id, None)
+                _cancelled.pop(job_id, None)
+
+def submit_job(params):
+    """
+    Queue an STL generation
+
+    Args:
+        params: resolved /generate parameters
+
+    Returns:
+        job ID
+    """
+    job_id = uuid.uuid4().hex
+    key = cache_key(result_params(params))
+    submitted = time.time()
+    job = {'key': key, 'submitted': submitted, 'finished': submitted, 'future': None}
+
+    # Already generated: the job is done on arrival
+    if cache_get(key) is None:
+        job['finished'] = None
+        job['future'] = _pool().submit(_run_job, job_id, params, key, _progress, _cancelled)
+        job['future'].add_done_callback(lambda future: job.update(finished=time.time()))
+
+    with _jobs_lock:
+        _prune_finished()
+        _jobs[job_id] = job
+    return job_id
+
+def job_status(job_id):
+    """Status dict for a job, or None if it is unknown"""
+    job = _jobs.get(job_id)
+    if job is None:
+        return None
+
+    future = job['future']
+    stage = _progress.get(job_id) if _progress is not None else None
+    error = None
+
+    if future is None:
+        status, stage = 'done', 'export'
+    elif future.cancelled():
+        status = 'cancelled'
+    elif not future.done():
+        status = 'running' if stage else 'queued'
+    elif isinstance(future.exception(), GenerationCancelled):
+        status = 'cancelled'
+    elif future.exception() is not None:
+        status, error = 'failed', str(future.exception())
+    else:
+        status = 'done'
+
+    result = {
+        'job_id': job_id,
+        'status': status,
+        'stage': stage,
+        'stage_index': STAGES.index(stage) if stage in STAGES else None,
+        'stages': list(STAGES),
+        # Stops counting once the job has finished
+        'elapsed': (job['finished'] or time.time()) - job['submitted']
+    }
+    if error:
+        result['error'] = error
+    return result
+
+def cancel_job(job_id):
+    """
+    Cancel a job; queued jobs are dropped, running ones stop at their next stage
+
+    Returns:
+        False if the job is unknown or already finished
+    """
+    job = _jobs.get(job_id)
+    if job is None or job['future'] is None or job['future'].done():
+        return False
+    if not job['future'].cancel():
+        _cancelled[job_id] = True
+    return True
+
+def job_result(job_id):
+    """
+    Finished job's STL
+
+    Returns:
+        (stl_path, metadata), or None if the job is unknown, unfinished or
+        its result has been evicted from the cache
+    """
+    status = job_status(job_id)
+    if status is None or status['status'] != 'done':
+        return None
+    return cache_get(_jobs[job_id]['key'])
@@ -1,14 +1,54 @@
+import threading
+import time
+
 import numpy as np
-from typing import List, Tuple, Optional
+from dataclasses import dataclass
+from itertools import chain
 from scipy.spatial import Voronoi
 
-# Numba import and JIT-compiled function
+import voronoi_cache
+
+
+@dataclass(frozen=True)
+class Layout:
+    """Pillar and hole centers as one (N, 2) array plus a boolean pillar mask"""
+    positions: np.ndarray
+    is_pillar: np.ndarray
+    
+    @property
+    def pillars(self) -> np.ndarray:
+        return self.positions[self.is_pillar]
+    
+    @property
+    def holes(self) -> np.ndarray:
+        return self.positions[~self.is_pillar]
+    
+    def __len__(self):
+        return len(self.positions)
+
+def _flatten_regions(vor):
+    """
+    Voronoi regions as flat vertex indices plus offsets, without a Python loop
+
+    Returns:
+        indices: (M,) vertex indices of all regions, back to back
+        offsets: (R + 1,) start of each region in indices
+    """
+    sizes = np.fromiter(map(len, vor.regions), dtype=np.int64, count=len(vor.regions))
+    offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    indices = np.fromiter(chain.from_iterable(vor.regions), dtype=np.int64, count=offsets[-1])
+    return indices, offsets
+
+# Numba import and JIT-compiled function. The kernel is compiled on first
+# use, or ahead of time by warmup_numba, and numba keeps the compiled code
+# on disk (NUMBA_CACHE_DIR, by default next to this file) across restarts.
 try:
     from numba import jit
     NUMBA_AVAILABLE = True
     
-    @jit(nopython=True)
-    def _compute_voronoi_centroids(vertices, regions_array, region_sizes, point_region, 
+    @jit(nopython=True, cache=True)
+    def _compute_voronoi_centroids(vertices, region_indices, region_offsets, point_region,
                                    old_points, width, height):
         """JIT-compiled centroid calculation for Lloyd's relaxation"""
         n_points = len(old_points)
@@ -16,15 +56,16 @@ try:
         
         for idx in range(n_points):
             region_idx = point_region[idx]
-            region_size = region_sizes[region_idx]
+            start = region_offsets[region_idx]
+            end = region_offsets[region_idx + 1]
             
-            if region_size == 0:
+            if end == start:
                 continue
             
             # Check for unbounded region (-1 vertex index)
             has_infinite = False
-            for i in range(region_size):
-                if regions_array[region_idx, i] == -1:
+            for i in range(start, end):
+                if region_indices[i] == -1:
                     has_infinite = True
                     break
             
@@ -33,13 +74,13 @@ try:
             
             # Calculate centroid
             cx, cy = 0.0, 0.0
-            for i in range(region_size):
-                vi = regions_array[region_idx, i]
+            for i in range(start, end):
+                vi = region_indices[i]
                 cx += vertices[vi, 0]
                 cy += vertices[vi, 1]
             
-            cx /= region_size
-            cy /= region_size
+            cx /= end - start
+            cy /= end - start
             
             # Clip to bounds
             if cx < 0:
@@ -57,35 +98,79 @@ try:
         
         return new_points
     
-    def _warmup_numba():
-        """Pre-compile the JIT function with a tiny dataset"""
-        warmup_points = np.random.rand(10, 2) * 10
-        warmup_vor = Voronoi(warmup_points)
-        
-        max_size = max(len(r) for r in warmup_vor.regions)
-        regions = np.full((len(warmup_vor.regions), max_size), -1, dtype=np.int32)
-        sizes = np.zeros(len(warmup_vor.regions), dtype=np.int32)
-        
-        for i, region in enumerate(warmup_vor.regions):
-            sizes[i] = len(region)
-            for j, vi in enumerate(region):
-                regions[i, j] = vi
+except ImportError:
+    NUMBA_AVAILABLE = False
+    
+    def _compute_voronoi_centroids(vertices, region_indices, region_offsets, point_region,
+                                   old_points, width, height):
+        """Vectorized centroid calculation for Lloyd's relaxation"""
+        sizes = np.diff(region_offsets)
+        owner = np.repeat(np.arange(len(sizes)), sizes)
+        unbounded = np.bincount(owner[region_indices == -1], minlength=len(sizes)) > 0
+        count = np.maximum(sizes, 1)
+        cx = np.bincount(owner, vertices[region_indices, 0], minlength=len(sizes)) / count
+        cy = np.bincount(owner, vertices[region_indices, 1], minlength=len(sizes)) / count
         
-        _ = _compute_voronoi_centroids(
-            warmup_vor.vertices, regions, sizes, 
-            warmup_vor.point_region, warmup_points, 10.0, 10.0
-        )
+        moved = ~unbounded[point_region] & (sizes[point_region] > 0)
+        new_points = old_points.copy()
+        new_points[moved, 0] = np.clip(cx[point_region[moved]], 0, width)
+        new_points[moved, 1] = np.clip(cy[point_region[moved]], 0, height)
+        return new_points
+
+_warmup_lock = threading.Lock()
+_warmup = {'state': 'cold' if NUMBA_AVAILABLE else 'unavailable', 'seconds': None, 'from_disk': None}
+
+def _warmup_numba():
+    """Compile the JIT function, or load it from disk, with a tiny dataset"""
+    with _warmup_lock:
+        if _warmup['state'] != 'cold':
+            return
+        _warmup['state'] = 'compiling'
+    start = time.perf_counter()
     
-    _warmup_numba()
+    # Own generator, so warming up never moves the global random state
+    warmup_points = np.random.default_rng(0).random((10, 2)) * 10
+    warmup_vor = Voronoi(warmup_points)
+    indices, offsets = _flatten_regions(warmup_vor)
+    _ = _compute_voronoi_centroids(
+        warmup_vor.vertices, indices, offsets,
+        warmup_vor.point_region, warmup_points, 10.0, 10.0
+    )
     
-except ImportError:
-    NUMBA_AVAILABLE = False
+    _warmup.update(
+        state='ready',
+        seconds=time.perf_counter() - start,
+        from_disk=bool(sum(_compute_voronoi_centroids.stats.cache_hits.values()))
+    )
+
+def warmup_numba(background=False):
+    """
+    Compile the Lloyd centroid kernel ahead of the first Voronoi request
+    
+    Args:
+        background: compile in a daemon thread and return at once
+    
+    Returns:
+        the warmup thread if background, else None
+    """
+    if not NUMBA_AVAILABLE:
+        return None
+    if not background:
+        _warmup_numba()
+        return None
+    thread = threading.Thread(target=_warmup_numba, name='numba-warmup', daemon=True)
+    thread.start()
+    return thread
 
-# Incremental cache for Voronoi layouts with LRU eviction
-from collections import OrderedDict
+def warmup_status():
+    """
+    Kernel warmup state
 
-_voronoi_cache = OrderedDict()
-_CACHE_MAX_CONFIGS = 100  # Maximum number of configurations to cache
+    Returns:
+        dict with state ('unavailable', 'cold', 'compiling' or 'ready'),
+        seconds the warmup took and whether numba loaded it from disk
+    """
+    return dict(_warmup)
 
 def get_cache_key(rows, cols, spacing, hole_probability, seed):
     """Create cache key with rounded floats for consistency"""
@@ -93,253 +178,199 @@ def get_cache_key(rows, cols, spacing, hole_probability, seed):
     hole_probability = round(float(hole_probability), 3)
     return f"{rows}_{cols}_{spacing}_{hole_probability}_{seed}"
 
-def _evict_oldest_if_needed():
-    """Evict oldest cache entry if we exceed the limit"""
-    if len(_voronoi_cache) > _CACHE_MAX_CONFIGS:
-        _voronoi_cache.popitem(last=False)  # Remove oldest (FIFO)
+def _max_displacement(old_points, new_points):
+    """Largest distance any point moved between two iterations"""
+    if len(old_points) == 0:
+        return 0.0
+    return float(np.sqrt(((new_points - old_points) ** 2).sum(axis=1).max()))
 
-def _apply_lloyd_iterations(points, width, height, iterations, cache_intermediates=None, start_iteration=0):
+def _apply_lloyd_iterations(points, width, height, iterations, record=None, start_iteration=0, tolerance=0.0):
     """
-    Apply Lloyd's relaxation for specified number of iterations
+    Apply Lloyd's relaxation for up to the specified number of iterations
     
     Args:
         points: Starting point positions
         width: Domain width
         height: Domain height
-        iterations: Number of iterations to perform
-        cache_intermediates: Dict to store intermediate results (optional)
-        start_iteration: Starting iteration number (for cache keys)
-    """
-    if iterations == 0:
-        return points
+        iterations: Maximum number of iterations to perform
+        record: Called with (iteration, points, displacement) after each
+            iteration (optional)
+        start_iteration: Starting iteration number (for record)
+        tolerance: Stop after the first iteration in which no point moves
+            farther than this (0 runs every iteration)
     
-    if NUMBA_AVAILABLE:
-        for i in range(iterations):
-            vor = Voronoi(points)
-            
-            max_region_size = max(len(r) for r in vor.regions)
-            n_regions = len(vor.regions)
-            regions_array = np.full((n_regions, max_region_size), -1, dtype=np.int32)
-            region_sizes = np.zeros(n_regions, dtype=np.int32)
-            
-            for j, region in enumerate(vor.regions):
-                region_sizes[j] = len(region)
-                for k, vi in enumerate(region):
-                    regions_array[j, k] = vi
-            
-            points = _compute_voronoi_centroids(
-                vor.vertices, regions_array, region_sizes,
-                vor.point_region, points, width, height
-            )
-            
-            # Cache intermediate result if requested
-            if cache_intermediates is not None:
-                iteration_num = start_iteration + i + 1
-                cache_intermediates[iteration_num] = points.copy()
-    else:
-        for i in range(iterations):
-            vor = Voronoi(points)
-            new_points = []
-            
-            for idx, region in enumerate(vor.point_region):
-                region_indices = vor.regions[region]
-                if -1 not in region_indices and len(region_indices) > 0:
-                    vertices = vor.vertices[region_indices]
-                    centroid = vertices.mean(axis=0)
-                    centroid[0] = np.clip(centroid[0], 0, width)
-                    centroid[1] = np.clip(centroid[1], 0, height)
-                    new_points.append(centroid)
-                else:
-                    new_points.append(points[idx])
-            
-            points = np.array(new_points)
-            
-            # Cache intermediate result if requested
-            if cache_intermediates is not None:
-                iteration_num = start_iteration + i + 1
-                cache_intermediates[iteration_num] = points.copy()
+    Returns:
+        (points, number of the last iteration run)
+    """
+    iteration = start_iteration
+    for iteration in range(start_iteration + 1, start_iteration + iterations + 1):
+        vor = Voronoi(points)
+        indices, offsets = _flatten_regions(vor)
+        
+        new_points = _compute_voronoi_centroids(
+            vor.vertices, indices, offsets,
+            vor.point_region, points, width, height
+        )
+        displacement = _max_displacement(points, new_points)
+        points = new_points
+        
+        if record is not None:
+            record(iteration, points, displacement)
+        
+        if tolerance > 0 and displacement <= tolerance:
+            break
     
-    return points
+    return points, iteration
 
 def generate_checkerboard(rows, cols):
-    return [[(i + j) % 2 for j in range(cols)] for i in range(rows)]
+    """Square checkerboard as a (rows, cols) mask, 1 for pillar"""
+    i, j = np.indices((rows, cols))
+    return ((i + j) % 2).astype(np.int8)
 
 def generate_hex_checkerboard(rows, cols):
-    layout = []
-    for i in range(rows):
-        row = []
-        for j in range(cols):
-            val = (i + j) % 2
-            row.append(val)
-        layout.append(row)
-    return layout
+    """Hex checkerboard as a (rows, cols) mask, 1 for pillar"""
+    return generate_checkerboard(rows, cols)
 
 def generate_hex_honeycomb_layout(rows, cols):
-    layout = [[1 for _ in range(cols)] for _ in range(rows)]
-    for i in range(rows):
-        for j in range(cols):
-            if i % 2 == 1 and j % 2 == 0:
-                layout[i][j] = 0
-    return layout
+    """Honeycomb as a (rows, cols) mask: holes on even columns of odd rows"""
+    i, j = np.indices((rows, cols))
+    return (~((i % 2 == 1) & (j % 2 == 0))).astype(np.int8)
+
+def _layout_rng(seed):
+    """
+    Random generator for one layout request
+
+    RandomState seeded like np.random.seed draws the same streams the global
+    generator did, so every seed keeps its layout, without sharing state
+    between concurrent requests.
+    """
+    return np.random.RandomState(seed)
 
-def generate_organic_hex_layout(rows, cols, hole_probability=0.2, jitter=0.1, spacing=1.0, seed=None):
-    if seed is not None:
-        np.random.seed(seed)
+def generate_organic_hex_layout(rows, cols, hole_probability=0.2, jitter=0.1, spacing=1.0, seed=None) -> Layout:
+    rng = _layout_rng(seed)
     
-    layout = []
     row_spacing = spacing * np.sqrt(3) / 2
+    i, j = np.indices((rows, cols))
+    x = j.ravel() * spacing + (i.ravel() % 2) * (spacing / 2)
+    y = i.ravel() * row_spacing
     
-    for i in range(rows):
-        for j in range(cols):
-            x = j * spacing + (spacing / 2 if i % 2 else 0)
-            y = i * row_spacing
-            
-            dx = np.random.uniform(-jitter, jitter)
-            dy = np.random.uniform(-jitter, jitter)
-            
-            x += dx
-            y += dy
-            
-            is_pillar = np.random.rand() > hole_probability
-            layout.append((x, y, is_pillar))
+    # One (dx, dy, hole) draw per point, in the same order as drawing them
+    # one at a time
+    draws = rng.random_sample((rows * cols, 3))
+    x = x + (-jitter + 2 * jitter * draws[:, 0])
+    y = y + (-jitter + 2 * jitter * draws[:, 1])
     
-    return layout
+    return Layout(np.column_stack([x, y]), draws[:, 2] > hole_probability)
 
-def generate_voronoi_layout(rows, cols, hole_probability=0.2, spacing=1.0, lloyd_iterations=0, seed=None):
+def generate_voronoi_layout(rows, cols, hole_probability=0.2, spacing=1.0, lloyd_iterations=0, seed=None,
+                            lloyd_tolerance=0.0, on_iteration=None) -> Layout:
     """
-    Generate Voronoi tessellation-based layout with incremental caching
+    Generate Voronoi tessellation-based layout, resuming relaxation from
+    the Voronoi cache
     
     Args:
         rows: number of rows (controls density)
         cols: number of columns (controls density)
         hole_probability: probability that a cell becomes a hole
         spacing: approximate spacing between points
-        lloyd_iterations: number of Lloyd's relaxation iterations
+        lloyd_iterations: maximum number of Lloyd's relaxation iterations
         seed: random seed for reproducibility
+        lloyd_tolerance: stop relaxing once no point moves farther than
+            this in one iteration (0 always runs lloyd_iterations)
+        on_iteration: called after every Lloyd iteration, once it is in the
+            cache; may raise to abandon the layout (optional)
     
     Returns:
-        List of (x, y, is_pillar) tuples
+        Layout
     """
-    if seed is not None:
-        np.random.seed(seed)
+    rng = _layout_rng(seed)
     
     width = cols * spacing
     height = rows * spacing * np.sqrt(3) / 2
     n_points = rows * cols
     
-    cache_key = get_cache_key(rows, cols, spacing, hole_probability, seed)
-    
-    # Move this config to end (most recently used) if it exists
-    if cache_key in _voronoi_cache:
-        _voronoi_cache.move_to_end(cache_key)
-    else:
-        # Initialize new cache entry
-        _voronoi_cache[cache_key] = {}
-        _evict_oldest_if_needed()
-    
-    iteration_cache = _voronoi_cache[cache_key]
+    # Initial random points, drawn on every call so the hole draw below
+    # always continues from the same random state
+    points = rng.random_sample((n_points, 2))
+    points[:, 0] *= width
+    points[:, 1] *= height
     
-    # Check if we have this exact iteration count cached
-    if lloyd_iterations in iteration_cache:
-        points = iteration_cache[lloyd_iterations]
-    else:
-        # Find the highest cached iteration below our target
-        cached_iterations = [k for k in iteration_cache.keys() if k < lloyd_iterations]
+    if lloyd_iterations > 0 and seed is None:
+        record = (lambda *_: on_iteration()) if on_iteration is not None else None
+        points, _ = _apply_lloyd_iterations(points, width, height, lloyd_iterations, record=record,
+                                            tolerance=lloyd_tolerance)
+    elif lloyd_iterations > 0:
+        cache_key = get_cache_key(rows, cols, spacing, hole_probability, seed)
         
-        if cached_iterations:
-            # Start from highest cached iteration
-            start_iteration = max(cached_iterations)
-            points = iteration_cache[start_iteration].copy()
-            remaining_iterations = lloyd_iterations - start_iteration
-            
-            # Apply remaining iterations and cache all intermediate steps
-            points = _apply_lloyd_iterations(
-                points, width, height, remaining_iterations, 
-                cache_intermediates=iteration_cache,
-                start_iteration=start_iteration
-            )
-        else:
-            # No cached data - start from scratch
-            if 0 in iteration_cache:
-                points = iteration_cache[0].copy()
-            else:
-                # Generate initial random points
-                points = np.random.rand(n_points, 2)
-                points[:, 0] *= width
-                points[:, 1] *= height
-                # Cache the initial state
-                iteration_cache[0] = points.copy()
+        # Resume from the closest stored iteration; a run that already
+        # stopped early ends where it stopped
+        target, start, cached = voronoi_cache.lookup(cache_key, lloyd_iterations, lloyd_tolerance)
+        if cached is not None:
+            points = cached
+        
+        if start < target:
+            def record(iteration, iteration_points, displacement):
+                voronoi_cache.record(cache_key, iteration, iteration_points, displacement)
+                if on_iteration is not None:
+                    on_iteration()
             
-            # Apply all iterations and cache all intermediate steps
-            points = _apply_lloyd_iterations(
-                points, width, height, lloyd_iterations,
-                cache_intermediates=iteration_cache,
-                start_iteration=0
+            points, end = _apply_lloyd_iterations(
+                np.array(points, dtype=float), width, height, target - start,
+                record=record, start_iteration=start, tolerance=lloyd_tolerance
             )
-        
-        # Ensure final iteration is cached (in case iterations was 0)
-        if lloyd_iterations not in iteration_cache:
-            iteration_cache[lloyd_iterations] = points.copy()
+            voronoi_cache.record(cache_key, end, points, None, final=True)
     
-    # Convert to layout format with pillar/hole designation
-    layout = []
-    for x, y in points:
-        is_pillar = np.random.rand() > hole_probability
-        layout.append((float(x), float(y), is_pillar))
+    # Pillar/hole designation
+    is_pillar = rng.random_sample(len(points)) > hole_probability
     
-    return layout
+    return Layout(np.asarray(points, dtype=float), is_pillar)
 
 def clear_voronoi_cache():
-    """Clear the Voronoi layout cache"""
-    global _voronoi_cache
-    _voronoi_cache = {}
+    """Clear the Voronoi layout cache, in memory and on disk"""
+    voronoi_cache.clear()
 
-def get_positions_from_square_layout(layout, spacing) -> Tuple[List[Tuple[float, float]], List[Tuple[float, float]]]:
-    """Extract (x,y) positions for pillars and holes from square grid layout"""
-    pillar_positions = []
-    hole_positions = []
-    rows = len(layout)
-    cols = len(layout[0])
-    
-    for i in range(rows):
-        for j in range(cols):
-            x = j * spacing
-            y = i * spacing
-            if layout[i][j] == 1:
-                pillar_positions.append((x, y))
-            else:
-                hole_positions.append((x, y))
-    
-    return pillar_positions, hole_positions
+def get_positions_from_square_layout(layout, spacing) -> Layout:
+    """Pillar and hole positions of a square grid mask"""
+    mask = np.asarray(layout)
+    i, j = np.indices(mask.shape)
+    positions = np.column_stack([j.ravel() * spacing, i.ravel() * spacing]).astype(float)
+    return Layout(positions, mask.ravel() == 1)
 
-def get_positions_from_hex_layout(layout, spacing) -> Tuple[List[Tuple[float, float]], List[Tuple[float, float]]]:
-    """Extract (x,y) positions for pillars and holes from hex grid layout"""
-    pillar_positions = []
-    hole_positions = []
+def get_positions_from_hex_layout(layout, spacing) -> Layout:
+    """Pillar and hole positions of a hex grid mask"""
+    mask = np.asarray(layout)
     row_spacing = spacing * np.sqrt(3) / 2
-    rows = len(layout)
-    cols = len(layout[0])
-    
-    for i in range(rows):
-        for j in range(cols):
-            x = j * spacing + (spacing / 2 if i % 2 else 0)
-            y = i * row_spacing
-            if layout[i][j] == 1:
-                pillar_positions.append((x, y))
-            else:
-                hole_positions.append((x, y))
-    
-    return pillar_positions, hole_positions
+    i, j = np.indices(mask.shape)
+    x = j.ravel() * spacing + (i.ravel() % 2) * (spacing / 2)
+    y = i.ravel() * row_spacing
+    return Layout(np.column_stack([x, y]).astype(float), mask.ravel() == 1)
 
-def get_positions_from_organic_layout(positions) -> Tuple[List[Tuple[float, float]], List[Tuple[float, float]]]:
-    """Extract (x,y) positions for pillars and holes from organic layout"""
-    pillar_positions = []
-    hole_positions = []
-    
-    for x, y, is_pillar in positions:
-        if is_pillar:
-            pillar_positions.append((x, y))
-        else:
-            hole_positions.append((x, y))
+def get_positions_from_organic_layout(positions) -> Layout:
+    """Layout from an organic/voronoi Layout or a list of (x, y, is_pillar) tuples"""
+    if isinstance(positions, Layout):
+        return positions
     
-    return pillar_positions, hole_positions
\ No newline at end of file
+    positions = list(positions)
+    xy = np.array([(x, y) for x, y, _ in positions], dtype=float).reshape(-1, 2)
+    is_pillar = np.array([bool(p) for _, _, p in positions], dtype=bool)
+    return Layout(xy, is_pillar)
+
+def generate_layout(layout_type, rows, cols, spacing, hole_probability=0.2, jitter=0.075,
+                    lloyd_iterations=0, seed=42, lloyd_tolerance=0.0, on_iteration=None) -> Layout:
+    """
+    Generate any supported layout type as a Layout
+
+    on_iteration is passed on to generate_voronoi_layout
+    """
+    if layout_type == 'square-checkerboard':
+        return get_positions_from_square_layout(generate_checkerboard(rows, cols), spacing)
+    elif layout_type == 'hex-checkerboard':
+        return get_positions_from_hex_layout(generate_hex_checkerboard(rows, cols), spacing)
+    elif layout_type == 'hex-honeycomb':
+        return get_positions_from_hex_layout(generate_hex_honeycomb_layout(rows, cols), spacing)
+    elif layout_type == 'organic':
+        return generate_organic_hex_layout(rows, cols, hole_probability, jitter, spacing, seed)
+    elif layout_type == 'voronoi':
+        return generate_voronoi_layout(rows, cols, hole_probability, spacing, lloyd_iterations, seed,
+                                       lloyd_tolerance, on_iteration)
+    raise ValueError(f"Unknown layout type: {layout_type}")
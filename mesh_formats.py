@@ -0,0 +1,164 @@
+import io
+import json
+import zipfile
+
+import numpy as np
+
+# Instanced model exports.
+#
+# Direct assembly can leave the pillars out of the model, so instead of
+# repeating every pillar's triangles these formats store the base mesh once,
+# one pillar mesh, and the pillar positions: GLB through the
+# EXT_mesh_gpu_instancing extension, 3MF as an object whose components place
+# the pillar object at every position. STL is written by pipeline.export_model.
+
+# /generate format -> download media type
+MODEL_MEDIA_TYPES = {
+    'stl': 'application/octet-stream',
+    'glb': 'model/gltf-binary',
+    '3mf': 'model/3mf'
+}
+
+# glTF is y-up; rotates the z-up model about x
+_Z_UP_TO_Y_UP = [-np.sqrt(0.5), 0.0, 0.0, np.sqrt(0.5)]
+
+_GLTF_FLOAT = 5126
+_GLTF_UINT = 5125
+_GLTF_ARRAY_BUFFER = 34962
+_GLTF_ELEMENT_ARRAY_BUFFER = 34963
+
+_3MF_CHUNK_ROWS = 100000
+
+
+def export_glb(base, pillar, positions):
+    """
+    Binary glTF of a base mesh plus one pillar mesh instanced at every position
+
+    Args:
+        base: (vertices, faces) of the model without pillars
+        pillar: (vertices, faces) of one pillar at the origin
+        positions: (N, 2) pillar centers; no pillar node is written if empty
+
+    Returns:
+        GLB bytes
+    """
+    positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+    blobs, views, accessors = [], [], []
+    offset = 0
+
+    def add(array, component_type, accessor_type, target=None, bounds=False):
+        nonlocal offset
+        data = array.tobytes()
+        view = {'buffer': 0, 'byteOffset': offset, 'byteLength': len(data)}
+        if target is not None:
+            view['target'] = target
+        accessor = {
+            'bufferView': len(views),
+            'componentType': component_type,
+            'count': len(array) if accessor_type != 'SCALAR' else array.size,
+            'type': accessor_type
+        }
+        if bounds:
+            accessor['min'] = array.min(axis=0).tolist()
+            accessor['max'] = array.max(axis=0).tolist()
+        blobs.append(data)
+        views.append(view)
+        accessors.append(accessor)
+        offset += len(data)  # every component is 4 bytes, so views stay aligned
+        return len(accessors) - 1
+
+    def add_mesh(vertices, faces):
+        return {'primitives': [{
+            'attributes': {'POSITION': add(np.asarray(vertices, dtype='<f4'), _GLTF_FLOAT, 'VEC3',
+                                           _GLTF_ARRAY_BUFFER, bounds=True)},
+            'indices': add(np.asarray(faces, dtype='<u4').ravel(), _GLTF_UINT, 'SCALAR',
+                           _GLTF_ELEMENT_ARRAY_BUFFER)
+        }]}
+
+    meshes = [add_mesh(*base)]
+    nodes = [{'rotation': _Z_UP_TO_Y_UP, 'children': [1]}, {'mesh': 0}]
+    gltf = {'asset': {'version': '2.0', 'generator': 'pillars-grid'}}
+
+    if len(positions):
+        meshes.append(add_mesh(*pillar))
+        translations = np.column_stack([positions, np.zeros(len(positions))]).astype('<f4')
+        instances = add(translations, _GLTF_FLOAT, 'VEC3')
+        nodes[0]['children'].append(2)
+        nodes.append({'mesh': 1, 'extensions': {
+            'EXT_mesh_gpu_instancing': {'attributes': {'TRANSLATION': instances}}
+        }})
+        gltf['extensionsUsed'] = gltf['extensionsRequired'] = ['EXT_mesh_gpu_instancing']
+
+    gltf.update(
+        scene=0, scenes=[{'nodes': [0]}], nodes=nodes, meshes=meshes,
+        accessors=accessors, bufferViews=views, buffers=[{'byteLength': offset}]
+    )
+
+    json_chunk = json.dumps(gltf, separators=(',', ':')).encode()
+    json_chunk += b' ' * (-len(json_chunk) % 4)
+    chunks = [
+        np.array([len(json_chunk), 0x4E4F534A], dtype='<u4').tobytes(), json_chunk,  # 'JSON'
+        np.array([offset, 0x004E4942], dtype='<u4').tobytes(), *blobs  # 'BIN\0'
+    ]
+    length = 12 + sum(len(chunk) for chunk in chunks)
+    return b''.join([b'glTF', np.array([2, length], dtype='<u4').tobytes(), *chunks])
+
+def _write_rows(entry, template, rows):
+    """Write each row of rows formatted with template, in chunks"""
+    for start in range(0, len(rows), _3MF_CHUNK_ROWS):
+        chunk = rows[start:start + _3MF_CHUNK_ROWS]
+        entry.write((template * len(chunk) % tuple(chunk.ravel().tolist())).encode())
+
+def _write_mesh_object(entry, object_id, vertices, faces):
+    entry.write(f'<object id="{object_id}" type="model"><mesh><vertices>'.encode())
+    _write_rows(entry, '<vertex x="%.9g" y="%.9g" z="%.9g"/>', np.asarray(vertices, dtype=float))
+    entry.write(b'</vertices><triangles>')
+    _write_rows(entry, '<triangle v1="%d" v2="%d" v3="%d"/>', np.asarray(faces, dtype=np.int64))
+    entry.write(b'</triangles></mesh></object>\n')
+
+def export_3mf(base, pillar, positions):
+    """
+    3MF package of a base mesh plus one pillar object placed at every position
+
+    Args:
+        base: (vertices, faces) of the model without pillars, closed on its own
+        pillar: (vertices, faces) of one closed pillar at the origin
+        positions: (N, 2) pillar centers
+
+    Returns:
+        3MF (zip) bytes
+    """
+    positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=6) as package:
+        package.writestr('[Content_Types].xml', (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="model" ContentType="application/vnd.ms-package.3dmanufacturing-3dmodel+xml"/>'
+            '</Types>'
+        ))
+        package.writestr('_rels/.rels', (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Target="/3D/3dmodel.model" Id="rel0" '
+            'Type="http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel"/>'
+            '</Relationships>'
+        ))
+        with package.open('3D/3dmodel.model', 'w', force_zip64=True) as entry:
+            entry.write(
+                b'<?xml version="1.0" encoding="UTF-8"?>\n'
+                b'<model unit="millimeter" xml:lang="en-US" '
+                b'xmlns="http://schemas.microsoft.com/3dmanufacturing/core/2015/02">\n<resources>\n'
+            )
+            _write_mesh_object(entry, 1, *base)
+            build_id = 1
+            if len(positions):
+                _write_mesh_object(entry, 2, *pillar)
+                entry.write(b'<object id="3" type="model"><components><component objectid="1"/>')
+                _write_rows(entry, '<component objectid="2" transform="1 0 0 0 1 0 0 0 1 %.9g %.9g 0"/>',
+                            positions)
+                entry.write(b'</components></object>\n')
+                build_id = 3
+            entry.write(f'</resources>\n<build><item objectid="{build_id}"/></build>\n</model>\n'.encode())
+    return output.getvalue()
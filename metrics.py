@@ -0,0 +1,132 @@
+import bisect
+import cProfile
+import marshal
+import threading
+import time
+from collections import defaultdict
+
+# Request timing and metrics.
+#
+# A StageTimer is passed to build_model as its stage callback: each call
+# closes the running stage and starts the next, so a request's time is split
+# into named stages. Finished timers feed per-endpoint latency histograms,
+# exported with the cache counters in Prometheus text format by
+# render_metrics.
+
+# Upper bounds of the histogram buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+_lock = threading.Lock()
+_histograms = {}  # (metric, labels) -> [bucket counts..., overflow count, sum, count]
+_counters = defaultdict(int)  # (metric, labels) -> count
+
+
+class StageTimer:
+    """Wall time of consecutive named stages of one request"""
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.stages = []  # (name, seconds), in order
+        self._start = time.perf_counter()
+        self._current = None
+        self._current_start = None
+
+    def __call__(self, name):
+        """Start stage name, ending the running one"""
+        now = time.perf_counter()
+        self._close(now)
+        self._current, self._current_start = name, now
+
+    def _close(self, now):
+        if self._current is not None:
+            self.stages.append((self._current, now - self._current_start))
+            self._current = None
+
+    def total(self):
+        return time.perf_counter() - self._start
+
+    def server_timing(self):
+        """Server-Timing header value of the stages so far, in milliseconds"""
+        self._close(time.perf_counter())
+        entries = [f'{name};dur={seconds * 1000:.1f}' for name, seconds in self.stages]
+        entries.append(f'total;dur={self.total() * 1000:.1f}')
+        return ', '.join(entries)
+
+    def finish(self):
+        """End the running stage and record every stage and the total"""
+        self._close(time.perf_counter())
+        labels = (('endpoint', self.endpoint),)
+        observe('pillars_request_seconds', self.total(), labels)
+        for name, seconds in self.stages:
+            observe('pillars_stage_seconds', seconds, labels + (('stage', name),))
+
+    def finish_stream(self, chunks, stage='export'):
+        """Pass a streamed body through, timing it as one more stage, then finish"""
+        self(stage)
+        try:
+            yield from chunks
+        finally:
+            self.finish()
+
+
+def observe(metric, value, labels=()):
+    """Add one observation to a histogram"""
+    with _lock:
+        histogram = _histograms.setdefault((metric, labels), [0] * (len(BUCKETS) + 3))
+        histogram[bisect.bisect_left(BUCKETS, value)] += 1
+        histogram[-2] += value
+        histogram[-1] += 1
+
+def count(metric, labels=(), amount=1):
+    """Increment a counter"""
+    with _lock:
+        _counters[(metric, labels)] += amount
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+def render_metrics(gauges=()):
+    """
+    All metrics in Prometheus text format
+
+    Args:
+        gauges: extra (metric, labels, value) samples read at scrape time,
+            such as cache counters kept by other modules
+    """
+    lines = []
+    with _lock:
+        histograms = sorted((key, list(values)) for key, values in _histograms.items())
+        counters = sorted(_counters.items())
+
+    typed = set()
+    for (metric, labels), values in histograms:
+        if metric not in typed:
+            lines.append(f'# TYPE {metric} histogram')
+            typed.add(metric)
+        cumulative = 0
+        for bound, bucket in zip(BUCKETS + ('+Inf',), values):
+            cumulative += bucket
+            lines.append(f'{metric}_bucket{_label_text(labels + (("le", bound),))} {cumulative}')
+        lines.append(f'{metric}_sum{_label_text(labels)} {values[-2]:.6f}')
+        lines.append(f'{metric}_count{_label_text(labels)} {values[-1]}')
+
+    for (metric, labels), value in [*counters, *(((m, l), v) for m, l, v in gauges)]:
+        if metric not in typed:
+            lines.append(f'# TYPE {metric} counter')
+            typed.add(metric)
+        lines.append(f'{metric}{_label_text(labels)} {value}')
+    return '\n'.join(lines) + '\n'
+
+def profile_call(fn):
+    """
+    Run fn under cProfile
+
+    Returns:
+        (result, marshalled pstats data, loadable with pstats.Stats)
+    """
+    profiler = cProfile.Profile()
+    result = profiler.runcall(fn)
+    profiler.create_stats()
+    return result, marshal.dumps(profiler.stats)
@@ -0,0 +1,474 @@
+import io
+import os
+import uuid
+import trimesh
+from itertools import chain
+from typing import NamedTuple
+
+import numpy as np
+
+from layouts import generate_layout
+from geometry import (
+    create_pillars_from_positions,
+    get_bounds_from_positions,
+    create_floor_with_holes,
+    create_walls_from_bounds
+)
+from assembly import assemble_model, pillar_shells, pillar_face_count, pillar_template
+from tiling import build_tiled
+from stage_cache import memoize
+from tessellation import model_sections, base_triangles
+from clearance import check_clearances, clearance_error
+from stl_stream import stream_stl, mesh_chunks, stl_size
+from mesh_formats import MODEL_MEDIA_TYPES, export_glb, export_3mf
+
+STREAM_BATCH_PILLARS = 2000
+
+# Largest mesh a streamed STL may hold in memory, in estimated triangles.
+# Streaming only leaves out the pillars; the floor and rim (or the whole
+# model, for assembly other than direct) are still built whole first
+STREAM_MAX_TRIANGLES = int(os.environ.get('PILLARS_STREAM_MAX_TRIANGLES', 20_000_000))
+
+# Part of every STL cache key; bump it whenever a change alters the files
+# generated for the same parameters, so the on-disk cache, which survives
+# restarts, stops serving files built before it
+GEOMETRY_VERSION = 2
+
+GENERATE_DEFAULTS = {
+    'layout_type': 'hex-checkerboard',
+    'rows': 50,
+    'cols': 50,
+    'spacing': 0.35,
+    'pillar_radius': 0.125,
+    'pillar_height': 10.0,
+    'hole_radius': 0.1,
+    'floor_thickness': 2.0,
+    'floor_padding_x': 0.25,
+    'floor_padding_y': 0.25,
+    'wall_thickness': 0.5,
+    'assembly': 'direct',
+    'floor_tile_size': 5.0,
+    'tile_size': 10.0,
+    'stream': False,
+    'cache': True,
+    'format': 'stl',
+    'hole_probability': 0.2,
+    'jitter': 0.075,
+    'lloyd_iterations': 0,
+    'lloyd_tolerance': 0.0,
+    'seed': 42,
+    'target_width': None,
+    'target_height': None,
+    'chord_tolerance': 0.005,
+    'triangle_budget': None,
+    'clearance_check': True,
+    'min_clearance': 0.0
+}
+
+# Parameters that only affect some layout types, and ones that never
+# change the exported file
+_LAYOUT_SPECIFIC = {
+    'hole_probability': ('organic', 'voronoi'),
+    'seed': ('organic', 'voronoi'),
+    'jitter': ('organic',),
+    'lloyd_iterations': ('voronoi',),
+    'lloyd_tolerance': ('voronoi',)
+}
+_OUTPUT_INDEPENDENT = ('stream', 'cache', 'clearance_check', 'min_clearance')
+
+# Dimension locks: a target floor size overrides the padding along its axis
+_LOCKED_PADDING = {'floor_padding_x': 'target_width', 'floor_padding_y': 'target_height'}
+
+# Generation stages in order, as reported to stage callbacks
+STAGES = ('layout', 'clearance', 'positions', 'pillars', 'floor', 'walls', 'assembly', 'export')
+
+# Parameters the circle segment count is chosen from (see tessellation)
+_TESSELLATION_INPUTS = ('pillar_radius', 'hole_radius', 'chord_tolerance', 'triangle_budget')
+
+# Each memoized stage: the stage it builds on, and the parameters it reads
+_STAGE_INPUTS = {
+    'layout': (None, ('layout_type', 'rows', 'cols', 'spacing', 'hole_probability', 'jitter',
+                      'lloyd_iterations', 'lloyd_tolerance', 'seed')),
+    'positions': ('layout', ('floor_padding_x', 'floor_padding_y', 'target_width', 'target_height')),
+    'pillars': ('layout', ('pillar_radius', 'pillar_height', 'floor_thickness', *_TESSELLATION_INPUTS)),
+    'floor': ('positions', ('hole_radius', 'floor_thickness', 'floor_tile_size', *_TESSELLATION_INPUTS)),
+    'walls': ('positions', ('floor_thickness', 'pillar_height', 'wall_thickness')),
+    'assembly': ('positions', ('pillar_radius', 'pillar_height', 'hole_radius', 'floor_thickness',
+                               'floor_tile_size', 'wall_thickness', 'assembly', 'tile_size', 'pillars',
+                               *_TESSELLATION_INPUTS))
+}
+
+
+class GenerationCancelled(Exception):
+    """Raised from a stage callback to abandon a generation"""
+
+
+class ClearanceError(Exception):
+    """Raised by build_model for a layout that fails the clearance check"""
+
+    def __init__(self, report):
+        super().__init__(clearance_error(report))
+        self.report = report
+
+
+class ModelTooLarge(ValueError):
+    """Raised by build_model for a streamed model whose in-memory mesh would exceed STREAM_MAX_TRIANGLES"""
+
+
+class GeneratedModel(NamedTuple):
+    model: trimesh.Trimesh
+    assembly: str
+    pillar_positions: np.ndarray
+    dimensions: str
+    sections: int
+    triangles: int
+
+
+def resolve_generate_params(params):
+    """
+    /generate parameters merged over their defaults
+
+    Raises:
+        ValueError: for an unknown output format, or a chord_tolerance or
+            triangle_budget that is not positive
+    """
+    params = {**GENERATE_DEFAULTS, **(params or {})}
+    if params['format'] not in MODEL_MEDIA_TYPES:
+        raise ValueError(f"unknown format {params['format']!r}, expected one of {', '.join(MODEL_MEDIA_TYPES)}")
+    # Written so NaN fails too
+    if not float(params['chord_tolerance']) > 0:
+        raise ValueError(f"chord_tolerance must be positive, got {params['chord_tolerance']!r}")
+    if params['triangle_budget'] is not None and not float(params['triangle_budget']) > 0:
+        raise ValueError(f"triangle_budget must be positive, got {params['triangle_budget']!r}")
+    return params
+
+def normalized_generate_params(params):
+    """Canonical form of resolved /generate parameters for cache keys"""
+    normalized = {}
+    for key, default in GENERATE_DEFAULTS.items():
+        if key in _OUTPUT_INDEPENDENT:
+            continue
+        if key in _LAYOUT_SPECIFIC and params['layout_type'] not in _LAYOUT_SPECIFIC[key]:
+            continue
+        if key in _LOCKED_PADDING and params[_LOCKED_PADDING[key]] is not None:
+            continue
+        value = params[key]
+        if value is not None and (isinstance(default, float) or default is None):
+            value = round(float(value), 9)
+        elif value is not None and isinstance(default, int):
+            value = int(value)
+        normalized[key] = value
+    return normalized
+
+def is_random_layout(params):
+    """Whether the layout is drawn anew on every request (a random layout type without a seed)"""
+    return params['layout_type'] in _LAYOUT_SPECIFIC['seed'] and params['seed'] is None
+
+def result_params(params):
+    """
+    Normalized parameters identifying a generated file, for STL cache keys
+
+    An unseeded random layout is a new draw every time, so its parameters
+    get a one-off nonce: its file can still be stored and served by key (job
+    and batch results), but never to another request.
+    """
+    normalized = {**normalized_generate_params(params), 'geometry_version': GEOMETRY_VERSION}
+    if is_random_layout(params):
+        normalized['nonce'] = uuid.uuid4().hex
+    return normalized
+
+def stage_keys(params):
+    """
+    Stage cache key of every memoized stage for resolved /generate parameters
+
+    A key chains the key of the stage it builds on with the normalized
+    values of only the parameters the stage reads.
+    """
+    normalized = {**normalized_generate_params(params), 'pillars': pillar_mode(params)}
+    keys = {}
+    for name, (upstream, inputs) in _STAGE_INPUTS.items():
+        keys[name] = (name, keys.get(upstream), *(normalized.get(key) for key in inputs))
+    return keys
+
+def apply_dimension_locks(params, positions):
+    """
+    Resolved parameters with the floor padding solved from the dimension locks
+
+    Args:
+        params: resolved /generate parameters; target_width and target_height,
+            when set, are the floor size wanted along x and y
+        positions: (N, 2) layout positions the floor is padded around
+
+    Returns:
+        params with floor_padding_x / floor_padding_y putting the floor bounds
+        at the targets, and the targets cleared so stage keys see the padding
+    """
+    if all(params[target] is None for target in _LOCKED_PADDING.values()) or not len(positions):
+        return params
+    positions = np.asarray(positions, dtype=float)
+    extent = positions.max(axis=0) - positions.min(axis=0)
+    params = dict(params)
+    for axis, (padding, target) in enumerate(_LOCKED_PADDING.items()):
+        if params[target] is not None:
+            params[padding] = (float(params[target]) - float(extent[axis])) / 2
+            params[target] = None
+    return params
+
+def pillar_mode(params):
+    """
+    How direct assembly treats the pillars: 'merged' into the model, or left
+    out as open 'shells' (streamed STL, GLB) or closed 'solids' (3MF) that the
+    exporter adds
+    """
+    if params['format'] == '3mf':
+        return 'solids'
+    if params['format'] == 'glb' or params['stream']:
+        return 'shells'
+    return 'merged'
+
+def _pillars_separate(generated, params):
+    return generated.assembly == 'direct' and pillar_mode(params) != 'merged'
+
+def _no_stage(name):
+    pass
+
+def _build(key, build):
+    return build()
+
+def _stage_memo(params):
+    """
+    memoize, or a plain call for an unseeded random layout: every stage
+    builds on the layout, so none of its results may be reused
+    """
+    return _build if is_random_layout(params) else memoize
+
+def _layout_stage(params, keys):
+    return _stage_memo(params)(keys['layout'], lambda: generate_layout(
+        params['layout_type'], params['rows'], params['cols'], params['spacing'],
+        params['hole_probability'], params['jitter'], params['lloyd_iterations'], params['seed'],
+        params['lloyd_tolerance']
+    ))
+
+def build_layout(params):
+    """Layout stage of resolved /generate parameters, to share between builds (see build_model)"""
+    return _layout_stage(params, stage_keys(params))
+
+def _clearance_report(params, layout):
+    """Clearance report of a layout, params having its dimension locks applied"""
+    floor_bounds = get_bounds_from_positions(layout.positions, padding_x=params['floor_padding_x'],
+                                             padding_y=params['floor_padding_y'])
+    return check_clearances(layout.pillars, layout.holes, floor_bounds, params['pillar_radius'],
+                            params['hole_radius'], float(params['min_clearance']))
+
+def check_model(params, layout=None):
+    """
+    Manufacturability pre-check of resolved /generate parameters
+
+    Builds only the layout stage, so it answers in milliseconds once the
+    layout is in the stage cache (/preview stores the layouts it builds).
+
+    Args:
+        layout: the Layout of params if it is already built, as the
+            preview endpoints have it
+
+    Returns:
+        report from clearance.check_clearances
+    """
+    if layout is None:
+        layout = _layout_stage(params, stage_keys(params))
+    return _clearance_report(apply_dimension_locks(params, layout.positions), layout)
+
+def build_model(params, stage=_no_stage, layout=None):
+    """
+    Build the model for resolved /generate parameters
+
+    Args:
+        params: parameters from resolve_generate_params
+        stage: called with each stage name from STAGES as it starts; may
+            raise GenerationCancelled to stop between stages
+        layout: the Layout of params from build_layout, built elsewhere;
+            the layout stage is skipped if given
+
+    Returns:
+        GeneratedModel. With direct assembly and a pillar_mode other than
+        'merged' the model leaves out the pillars, which stream_model emits
+        in batches and the instanced formats store once.
+
+    Raises:
+        ClearanceError: with clearance_check set, for a layout failing
+            check_model, before any geometry is built
+        ModelTooLarge: with stream set, before any geometry is built
+    """
+    pillar_radius = params['pillar_radius']
+    pillar_height = params['pillar_height']
+    hole_radius = params['hole_radius']
+    floor_thickness = params['floor_thickness']
+    wall_thickness = params['wall_thickness']
+    pillar_output = pillar_mode(params)
+    keys = stage_keys(params)
+    memo = _stage_memo(params)
+
+    # Generate layout and extract positions
+    stage('layout')
+    if layout is None:
+        layout = _layout_stage(params, keys)
+
+    # Downstream stages see the solved padding
+    locked = apply_dimension_locks(params, layout.positions)
+    if locked is not params:
+        params = locked
+        keys = stage_keys(params)
+
+    if params['clearance_check']:
+        stage('clearance')
+        report = _clearance_report(params, layout)
+        if not report['ok']:
+            raise ClearanceError(report)
+
+    stage('positions')
+    pillar_positions, hole_positions, floor_bounds = memo(keys['positions'], lambda: (
+        layout.pillars, layout.holes,
+        get_bounds_from_positions(layout.positions, padding_x=params['floor_padding_x'],
+                                  padding_y=params['floor_padding_y'])
+    ))
+    min_x, max_x, min_y, max_y = floor_bounds
+    sections = model_sections(pillar_radius, hole_radius, len(pillar_positions), len(hole_positions),
+                              params['chord_tolerance'], params['triangle_budget'])
+
+    if params['stream']:
+        in_memory = base_triangles(len(pillar_positions), len(hole_positions), sections)
+        if params['assembly'] != 'direct':
+            in_memory += len(pillar_positions) * pillar_face_count(sections)
+        if in_memory > STREAM_MAX_TRIANGLES:
+            raise ModelTooLarge(
+                f'model of about {in_memory} triangles held in memory exceeds the streaming limit of '
+                f'{STREAM_MAX_TRIANGLES}; raise chord_tolerance or set a triangle_budget'
+            )
+
+    def assemble():
+        assembly = params['assembly']
+        if assembly in ('direct', 'tiled'):
+            # One stage whichever path builds it, the tiled fallback included
+            stage('assembly')
+        if assembly == 'direct':
+            # Stitch everything into one mesh without CSG; layouts with
+            # overlapping circles fall back to the tiled union below
+            try:
+                return assemble_model(
+                    pillar_positions, hole_positions, floor_bounds,
+                    pillar_radius=pillar_radius,
+                    pillar_height=pillar_height,
+                    hole_radius=hole_radius,
+                    floor_thickness=floor_thickness,
+                    wall_thickness=wall_thickness,
+                    sections=sections,
+                    pillars=pillar_output == 'merged',
+                    cap_pillars=pillar_output == 'solids'
+                ), assembly
+            except ValueError:
+                assembly = 'tiled'
+
+        if assembly == 'tiled':
+            # Union the grid tile by tile across the tile worker pool
+            return build_tiled(
+                pillar_positions, hole_positions, floor_bounds,
+                pillar_radius=pillar_radius,
+                pillar_height=pillar_height,
+                hole_radius=hole_radius,
+                floor_thickness=floor_thickness,
+                wall_thickness=wall_thickness,
+                tile_size=params['tile_size'],
+                sections=sections
+            ), assembly
+
+        # Build geometry
+        stage('pillars')
+        pillars = memo(keys['pillars'], lambda: create_pillars_from_positions(
+            pillar_positions, pillar_radius, pillar_height, floor_thickness, sections
+        ))
+
+        stage('floor')
+        floor = memo(keys['floor'], lambda: create_floor_with_holes(
+            holes=hole_positions,
+            floor_thickness=floor_thickness,
+            padding_x=params['floor_padding_x'],
+            padding_y=params['floor_padding_y'],
+            hole_radius=hole_radius,
+            bounds_positions=layout.positions,
+            tile_size=params['floor_tile_size'],
+            sections=sections
+        ))
+
+        stage('walls')
+        walls = memo(keys['walls'], lambda: create_walls_from_bounds(
+            min_x, max_x, min_y, max_y,
+            wall_height=floor_thickness + pillar_height,
+            wall_thickness=wall_thickness
+        ))
+
+        # Union all parts
+        stage('assembly')
+        return trimesh.boolean.union([pillars, floor, walls]), 'boolean'
+
+    # A streamed base mesh is sent once and dropped; caching it would keep
+    # the largest models in memory
+    model, assembly = (_build if params['stream'] else memo)(keys['assembly'], assemble)
+
+    # Get dimensions; pillars left out of the model still reach the full height
+    bounds = model.bounds
+    size = bounds[1] - bounds[0]
+    if len(pillar_positions):
+        size[2] = max(size[2], floor_thickness + pillar_height)
+    dimensions = f'{size[0]:.2f}x{size[1]:.2f}x{size[2]:.2f}'
+
+    # Triangles of the model as exported, pillars left out of it included
+    triangles = len(model.faces)
+    if assembly == 'direct' and pillar_output != 'merged':
+        triangles += len(pillar_positions) * pillar_face_count(sections, closed=pillar_output == 'solids')
+
+    return GeneratedModel(model, assembly, pillar_positions, dimensions, sections, triangles)
+
+def _pillar_chunks(pillar_positions, pillar_radius, pillar_height, floor_thickness, sections):
+    """Yield pillar walls and caps in batches for streaming export"""
+    for start in range(0, len(pillar_positions), STREAM_BATCH_PILLARS):
+        yield pillar_shells(
+            pillar_positions[start:start + STREAM_BATCH_PILLARS],
+            pillar_radius, pillar_height, floor_thickness, sections
+        )
+
+def stream_model(generated, params):
+    """
+    Binary STL of a generated model as a byte generator
+
+    Returns:
+        (content_length, body)
+    """
+    model = generated.model
+    chunks = [mesh_chunks(model.vertices, model.faces)]
+    n_triangles = len(model.faces)
+    if _pillars_separate(generated, params) and len(generated.pillar_positions):
+        chunks.append(_pillar_chunks(
+            generated.pillar_positions, params['pillar_radius'],
+            params['pillar_height'], params['floor_thickness'], generated.sections
+        ))
+        n_triangles += len(generated.pillar_positions) * pillar_face_count(generated.sections)
+
+    return stl_size(n_triangles), stream_stl(n_triangles, chain.from_iterable(chunks))
+
+def export_model(generated, params):
+    """Generated model in params['format'], built in memory"""
+    model = generated.model
+    separate = _pillars_separate(generated, params)
+    if params['format'] == 'stl':
+        if separate:
+            return b''.join(stream_model(generated, params)[1])
+        output = io.BytesIO()
+        model.export(output, file_type='stl')
+        return output.getvalue()
+
+    positions = generated.pillar_positions if separate else np.empty((0, 2))
+    closed = params['format'] == '3mf'
+    pillar = pillar_template(params['pillar_radius'], params['pillar_height'],
+                             params['floor_thickness'], generated.sections, closed=closed)
+    export = export_3mf if closed else export_glb
+    return export((model.vertices, model.faces), pillar, positions)
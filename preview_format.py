@@ -0,0 +1,55 @@
+import numpy as np
+
+# Binary /preview payload, read by API.fetchPreview as typed arrays:
+# a fixed little-endian header, then the pillar and the hole centers as
+# interleaved float32 (x, y) pairs. The header is a multiple of 4 bytes so
+# both arrays can be viewed in place as Float32Arrays.
+
+PREVIEW_MEDIA_TYPE = 'application/vnd.pillars-grid.preview'
+PREVIEW_MAGIC = b'PGPV'
+PREVIEW_VERSION = 1
+
+PREVIEW_HEADER = np.dtype([
+    ('magic', 'S4'),
+    ('version', '<u4'),
+    ('pillar_count', '<u4'),
+    ('hole_count', '<u4'),
+    ('bounds', '<f8', (4,))  # min_x, max_x, min_y, max_y
+])
+
+def encode_preview(pillars, holes, bounds):
+    """
+    Pack preview positions into the binary payload
+
+    Args:
+        pillars: (N, 2) pillar centers
+        holes: (M, 2) hole centers
+        bounds: (min_x, max_x, min_y, max_y) of the floor
+    """
+    header = np.zeros(1, dtype=PREVIEW_HEADER)
+    header['magic'] = PREVIEW_MAGIC
+    header['version'] = PREVIEW_VERSION
+    header['pillar_count'] = len(pillars)
+    header['hole_count'] = len(holes)
+    header['bounds'] = bounds
+    return b''.join([
+        header.tobytes(),
+        np.ascontiguousarray(pillars, dtype='<f4').tobytes(),
+        np.ascontiguousarray(holes, dtype='<f4').tobytes()
+    ])
+
+def decode_preview(data):
+    """
+    Unpack a binary preview payload
+
+    Returns:
+        (pillars, holes, bounds) as float32 (N, 2) and (M, 2) arrays and a
+        tuple of floats
+    """
+    header = np.frombuffer(data, dtype=PREVIEW_HEADER, count=1)[0]
+    if header['magic'] != PREVIEW_MAGIC or header['version'] != PREVIEW_VERSION:
+        raise ValueError("not a version 1 preview payload")
+    n_pillars, n_holes = int(header['pillar_count']), int(header['hole_count'])
+    points = np.frombuffer(data, dtype='<f4', offset=PREVIEW_HEADER.itemsize,
+                           count=2 * (n_pillars + n_holes)).reshape(-1, 2)
+    return points[:n_pillars], points[n_pillars:], tuple(float(b) for b in header['bounds'])
@@ -0,0 +1,157 @@
+from dataclasses import dataclass
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+# Viewport queries for large previews.
+#
+# A PreviewIndex is built once per layout: positions bucketed into a uniform
+# grid, so the points inside a rectangle are read as one contiguous slice per
+# grid column, plus what the measurement overlay needs (the layout extent and
+# for every pillar a neighbour at the nominal spacing). A region query then
+# returns the visible points, or, when they would be drawn smaller than a
+# pixel or are too many to send, pillar and hole counts per screen cell.
+
+# Average positions per index bucket
+BUCKET_POINTS = 16
+# Points drawn smaller than this radius in pixels are summarized
+MIN_POINT_RADIUS_PX = 0.5
+MAX_REGION_POINTS = 50000
+# Side of a density cell, in pixels
+DENSITY_CELL_PX = 4
+# Largest distance from the nominal spacing for a spacing anchor, as the
+# client's measurement overlay used
+SPACING_TOLERANCE = 0.01
+
+
+@dataclass
+class PreviewIndex:
+    positions: np.ndarray  # (N, 2), ordered by bucket
+    is_pillar: np.ndarray
+    bucket_start: np.ndarray  # first position of every bucket, plus N
+    origin: np.ndarray  # (x, y) of the bucket grid corner
+    bucket_size: float
+    shape: tuple  # buckets along (x, y)
+    partner: np.ndarray  # a pillar at the nominal spacing from each position, -1 if none
+    extent: tuple  # (min_x, max_x, min_y, max_y) of all positions
+
+
+def build_preview_index(layout, spacing):
+    """
+    Index a Layout for region queries
+
+    Args:
+        layout: Layout to index
+        spacing: nominal pillar spacing, for the spacing anchors
+    """
+    positions = np.asarray(layout.positions, dtype=float).reshape(-1, 2)
+    is_pillar = np.asarray(layout.is_pillar, dtype=bool)
+    if len(positions):
+        lower, upper = positions.min(axis=0), positions.max(axis=0)
+    else:
+        lower = upper = np.zeros(2)
+    size = np.maximum(upper - lower, 1e-9)
+    bucket_size = float(np.sqrt(size[0] * size[1] * BUCKET_POINTS / max(len(positions), 1)))
+    shape = tuple(np.maximum(np.ceil(size / bucket_size).astype(int), 1))
+
+    cell = np.minimum(((positions - lower) // bucket_size).astype(int), np.array(shape) - 1)
+    bucket = cell[:, 0] * shape[1] + cell[:, 1]
+    order = np.argsort(bucket, kind='stable')
+    positions, is_pillar = positions[order], is_pillar[order]
+    bucket_start = np.searchsorted(bucket[order], np.arange(shape[0] * shape[1] + 1))
+
+    partner = np.full(len(positions), -1, dtype=np.intp)
+    pillars = np.flatnonzero(is_pillar)
+    if len(pillars) > 1:
+        distance, nearest = cKDTree(positions[pillars]).query(positions[pillars], k=2)
+        at_spacing = np.abs(distance[:, 1] - spacing) < SPACING_TOLERANCE
+        partner[pillars[at_spacing]] = pillars[nearest[at_spacing, 1]]
+
+    return PreviewIndex(
+        positions, is_pillar, bucket_start, lower, bucket_size, shape, partner,
+        (float(lower[0]), float(upper[0]), float(lower[1]), float(upper[1]))
+    )
+
+def _window(index, viewport):
+    """Indices of the positions inside viewport (min_x, max_x, min_y, max_y)"""
+    min_x, max_x, min_y, max_y = viewport
+    nx, ny = index.shape
+    x0, y0 = np.clip(((np.array([min_x, min_y]) - index.origin) // index.bucket_size).astype(int), 0, [nx - 1, ny - 1])
+    x1, y1 = np.clip(((np.array([max_x, max_y]) - index.origin) // index.bucket_size).astype(int), 0, [nx - 1, ny - 1])
+    columns = np.arange(x0, x1 + 1) * ny
+    starts, ends = index.bucket_start[columns + y0], index.bucket_start[columns + y1 + 1]
+    candidates = np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)] or [np.empty(0, int)])
+    xy = index.positions[candidates]
+    inside = (xy[:, 0] >= min_x) & (xy[:, 0] <= max_x) & (xy[:, 1] >= min_y) & (xy[:, 1] <= max_y)
+    return candidates[inside]
+
+def _nearest(index, mask, center):
+    """Index of the masked position closest to center, or None"""
+    candidates = np.flatnonzero(mask)
+    if not len(candidates):
+        return None
+    return candidates[np.argmin(np.sum((index.positions[candidates] - center) ** 2, axis=1))]
+
+def measurement_anchors(index, center):
+    """
+    Positions the measurement overlay labels, chosen nearest to center
+
+    Returns:
+        dict with 'spacing' ([x1, y1, x2, y2] of two pillars at the nominal
+        spacing), 'pillar' and 'hole' ([x, y]); each None if there is none
+    """
+    center = np.asarray(center, dtype=float)
+    spaced = _nearest(index, index.partner >= 0, center)
+    pillar = _nearest(index, index.is_pillar, center)
+    hole = _nearest(index, ~index.is_pillar, center)
+    return {
+        'spacing': (np.r_[index.positions[spaced], index.positions[index.partner[spaced]]].tolist()
+                    if spaced is not None else None),
+        'pillar': index.positions[pillar].tolist() if pillar is not None else None,
+        'hole': index.positions[hole].tolist() if hole is not None else None
+    }
+
+def query_region(index, viewport, pixel_size, pillar_radius):
+    """
+    Visible part of a layout at one zoom level
+
+    Args:
+        viewport: (min_x, max_x, min_y, max_y) in layout coordinates
+        pixel_size: layout units per screen pixel
+        pillar_radius: for deciding whether pillars are still visible as points
+
+    Returns:
+        dict with 'detail' and either 'pillars' and 'holes' as flat
+        [x0, y0, x1, y1, ...] lists ('points'), or 'density' with 'origin',
+        'cell', 'shape' ([nx, ny]) and per-cell 'pillars' and 'holes' counts,
+        x-major ('density')
+    """
+    visible = _window(index, viewport)
+    if pillar_radius / pixel_size >= MIN_POINT_RADIUS_PX and len(visible) <= MAX_REGION_POINTS:
+        visible_pillar = index.is_pillar[visible]
+        return {
+            'detail': 'points',
+            'pillars': index.positions[visible[visible_pillar]].ravel().tolist(),
+            'holes': index.positions[visible[~visible_pillar]].ravel().tolist()
+        }
+
+    min_x, max_x, min_y, max_y = viewport
+    cell = DENSITY_CELL_PX * pixel_size
+    shape = (max(int(np.ceil((max_x - min_x) / cell)), 1), max(int(np.ceil((max_y - min_y) / cell)), 1))
+    edges = [min_x + cell * np.arange(shape[0] + 1), min_y + cell * np.arange(shape[1] + 1)]
+    xy = index.positions[visible]
+    visible_pillar = index.is_pillar[visible]
+    counts = [
+        np.histogram2d(xy[mask, 0], xy[mask, 1], bins=edges)[0].astype(int).ravel().tolist()
+        for mask in (visible_pillar, ~visible_pillar)
+    ]
+    return {
+        'detail': 'density',
+        'density': {
+            'origin': [float(min_x), float(min_y)],
+            'cell': float(cell),
+            'shape': list(shape),
+            'pillars': counts[0],
+            'holes': counts[1]
+        }
+    }
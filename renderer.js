@@ -22,8 +22,12 @@ const Renderer = {
         
         this._drawWalls(ctx, bounds, transform, parameters.wallThickness);
         this._drawFloor(ctx, bounds, transform);
-        this._drawHoles(ctx, holes, transform, parameters.holeRadius);
-        this._drawPillars(ctx, pillars, transform, parameters.pillarRadius);
+        if (previewData.density) {
+            this._drawDensity(ctx, previewData.density, transform, parameters);
+        } else {
+            this._drawHoles(ctx, holes, transform, parameters.holeRadius);
+            this._drawPillars(ctx, pillars, transform, parameters.pillarRadius);
+        }
         
         if (showMeasurements) {
             this._drawMeasurements(ctx, previewData, transform, parameters);
@@ -112,6 +116,23 @@ const Renderer = {
     // PRIVATE HELPERS
     // ========================================================================
     
+    /**
+     * Bounding box of interleaved x, y coordinate arrays
+     * @returns {Object} { minX, maxX, minY, maxY }
+     */
+    pointExtent(...coordArrays) {
+        let minX = Infinity, maxX = -Infinity, minY = Infinity, maxY = -Infinity;
+        for (const xy of coordArrays) {
+            for (let i = 0; i < xy.length; i += 2) {
+                if (xy[i] < minX) minX = xy[i];
+                if (xy[i] > maxX) maxX = xy[i];
+                if (xy[i + 1] < minY) minY = xy[i + 1];
+                if (xy[i + 1] > maxY) maxY = xy[i + 1];
+            }
+        }
+        return { minX, maxX, minY, maxY };
+    },
+    
     _calculateTransform(bounds, canvasWidth, canvasHeight, zoom, wallThickness) {
         const innerWidth = bounds.maxX - bounds.minX;
         const innerHeight = bounds.maxY - bounds.minY;
@@ -172,34 +193,102 @@ const Renderer = {
         );
     },
     
-    _drawHoles(ctx, holes, transform, holeRadius) {
+    /**
+     * Interleaved x, y coordinates of a point array ({ length, xy }) or of
+     * an array of {x, y} objects
+     */
+    _coords(points) {
+        if (points.xy) return points.xy;
+        const xy = new Float32Array(2 * points.length);
+        points.forEach((p, i) => {
+            xy[2 * i] = p.x;
+            xy[2 * i + 1] = p.y;
+        });
+        return xy;
+    },
+    
+    _drawCircles(ctx, points, transform, radius, fillStyle) {
         const { scale, offsetX, offsetY } = transform;
-        const holeRadiusScaled = holeRadius * scale;
+        const radiusScaled = radius * scale;
+        const xy = this._coords(points);
         
-        ctx.fillStyle = 'rgba(255, 100, 100, 0.5)';
+        ctx.fillStyle = fillStyle;
         ctx.beginPath();
-        holes.forEach(hole => {
-            const x = hole.x * scale + offsetX;
-            const y = hole.y * scale + offsetY;
-            ctx.moveTo(x + holeRadiusScaled, y);
-            ctx.arc(x, y, holeRadiusScaled, 0, Math.PI * 2);
-        });
+        for (let i = 0; i < xy.length; i += 2) {
+            const x = xy[i] * scale + offsetX;
+            const y = xy[i + 1] * scale + offsetY;
+            ctx.moveTo(x + radiusScaled, y);
+            ctx.arc(x, y, radiusScaled, 0, Math.PI * 2);
+        }
         ctx.fill();
     },
     
+    _drawHoles(ctx, holes, transform, holeRadius) {
+        this._drawCircles(ctx, holes, transform, holeRadius, 'rgba(255, 100, 100, 0.5)');
+    },
+    
     _drawPillars(ctx, pillars, transform, pillarRadius) {
+        this._drawCircles(ctx, pillars, transform, pillarRadius, 'rgba(50, 120, 200, 0.7)');
+    },
+    
+    /**
+     * Per-cell pillar and hole counts of a region preview, each cell shaded
+     * by the share of its area the circles would cover
+     */
+    _drawDensity(ctx, density, transform, parameters) {
         const { scale, offsetX, offsetY } = transform;
-        const pillarRadiusScaled = pillarRadius * scale;
+        const { origin, cell, shape } = density;
+        const cellArea = cell * cell;
+        const size = cell * scale;
+        const layers = [
+            [density.holes, parameters.holeRadius, [255, 100, 100], 0.5],
+            [density.pillars, parameters.pillarRadius, [50, 120, 200], 0.7]
+        ];
+        
+        for (const [counts, radius, [r, g, b], alpha] of layers) {
+            const circleArea = Math.PI * radius * radius;
+            for (let i = 0; i < shape[0]; i++) {
+                const x = (origin[0] + i * cell) * scale + offsetX;
+                for (let j = 0; j < shape[1]; j++) {
+                    const n = counts[i * shape[1] + j];
+                    if (!n) continue;
+                    const coverage = Math.min(n * circleArea / cellArea, 1);
+                    ctx.fillStyle = `rgba(${r}, ${g}, ${b}, ${alpha * coverage})`;
+                    ctx.fillRect(x, (origin[1] + j * cell) * scale + offsetY, size, size);
+                }
+            }
+        }
+    },
+    
+    /**
+     * Positions the measurement overlay labels, in the shape /preview/region
+     * returns them: two pillars at the nominal spacing and one pillar and hole
+     */
+    _measurementAnchors(pillarXY, holeXY, spacing) {
+        const point = (xy, i) => [xy[2 * i], xy[2 * i + 1]];
+        
+        // Find adjacent pillars for spacing, sorting indices rather than points
+        const n = pillarXY.length / 2;
+        const order = new Uint32Array(n).map((_, i) => i);
+        order.sort((a, b) => pillarXY[2 * a + 1] - pillarXY[2 * b + 1] || pillarXY[2 * a] - pillarXY[2 * b]);
+        let spacingPair = null;
+        
+        for (let i = 0; i < order.length - 1; i++) {
+            const p1 = point(pillarXY, order[i]);
+            const p2 = point(pillarXY, order[i + 1]);
+            const dist = Math.sqrt((p2[0] - p1[0]) ** 2 + (p2[1] - p1[1]) ** 2);
+            
+            if (Math.abs(dist - spacing) < 0.01) {
+                spacingPair = [...p1, ...p2];
+                break;
+            }
+        }
         
-        ctx.fillStyle = 'rgba(50, 120, 200, 0.7)';
-        ctx.beginPath();
-        pillars.forEach(pillar => {
-            const x = pillar.x * scale + offsetX;
-            const y = pillar.y * scale + offsetY;
-            ctx.moveTo(x + pillarRadiusScaled, y);
-            ctx.arc(x, y, pillarRadiusScaled, 0, Math.PI * 2);
-        });
-        ctx.fill();
+        return {
+            spacing: spacingPair,
+            pillar: n > 0 ? point(pillarXY, 0) : null,
+            hole: holeXY.length > 0 ? point(holeXY, 0) : null
+        };
     },
     
     _drawMeasurements(ctx, previewData, transform, parameters) {
@@ -212,34 +301,25 @@ const Renderer = {
         const floorPaddingY = parameters.floorPaddingY;
         const wt = parameters.wallThickness;
         
-        if (pillars.length < 2) return;
-        
-        // Find adjacent pillars for spacing
-        const sortedPillars = [...pillars].sort((a, b) => a.y - b.y || a.x - b.x);
-        let pillar1 = null, pillar2 = null;
+        const pillarCount = previewData.counts ? previewData.counts.pillars : pillars.length;
+        if (pillarCount < 2) return;
         
-        for (let i = 0; i < sortedPillars.length - 1; i++) {
-            const p1 = sortedPillars[i];
-            const p2 = sortedPillars[i + 1];
-            const dist = Math.sqrt((p2.x - p1.x) ** 2 + (p2.y - p1.y) ** 2);
-            
-            if (Math.abs(dist - spacing) < 0.01) {
-                pillar1 = p1;
-                pillar2 = p2;
-                break;
-            }
-        }
+        // Region previews carry their anchors and extent, full previews are searched here
+        const pillarXY = previewData.anchors ? null : this._coords(pillars);
+        const holeXY = previewData.anchors ? null : this._coords(holes);
+        const anchors = previewData.anchors || this._measurementAnchors(pillarXY, holeXY, spacing);
         
         // Draw spacing dimension
-        if (pillar1 && pillar2) {
+        if (anchors.spacing) {
+            const [x1, y1, x2, y2] = anchors.spacing;
             const spacingOffset = typeof MeasurementStyles !== 'undefined' 
                 ? MeasurementStyles.get('spacingLabelOffset') : 0;
             this._drawDimensionLine(
                 ctx, 
-                pillar1.x * scale + offsetX, 
-                pillar1.y * scale + offsetY,
-                pillar2.x * scale + offsetX, 
-                pillar2.y * scale + offsetY,
+                x1 * scale + offsetX, 
+                y1 * scale + offsetY,
+                x2 * scale + offsetX, 
+                y2 * scale + offsetY,
                 `Spacing: ${spacing.toFixed(3)} mm`,
                 undefined,
                 spacingOffset
@@ -247,12 +327,12 @@ const Renderer = {
         }
         
         // Draw pillar radius
-        if (pillars.length > 0) {
-            const pillar = pillars[0];
+        if (anchors.pillar) {
+            const [x, y] = anchors.pillar;
             this._drawRadiusLine(
                 ctx,
-                pillar.x * scale + offsetX,
-                pillar.y * scale + offsetY,
+                x * scale + offsetX,
+                y * scale + offsetY,
                 pillarRadiusValue * scale,
                 `Pillar r=${pillarRadiusValue.toFixed(3)} mm`,
                 -45
@@ -260,12 +340,12 @@ const Renderer = {
         }
         
         // Draw hole radius
-        if (holes.length > 0) {
-            const hole = holes[0];
+        if (anchors.hole) {
+            const [x, y] = anchors.hole;
             this._drawRadiusLine(
                 ctx,
-                hole.x * scale + offsetX,
-                hole.y * scale + offsetY,
+                x * scale + offsetX,
+                y * scale + offsetY,
                 holeRadiusValue * scale,
                 `Hole r=${holeRadiusValue.toFixed(3)} mm`,
                 135
@@ -279,11 +359,9 @@ const Renderer = {
         const floorTopY = bounds.minY * scale + offsetY;
         
         // Find outermost pillar/hole positions
-        const allPositions = [...pillars, ...holes];
-        const xValues = allPositions.map(p => p.x);
-        const yValues = allPositions.map(p => p.y);
-        const leftmostX = Math.min(...xValues) * scale + offsetX;
-        const topmostY = Math.min(...yValues) * scale + offsetY;
+        const extent = previewData.extent || this.pointExtent(pillarXY, holeXY);
+        const leftmostX = extent.minX * scale + offsetX;
+        const topmostY = extent.minY * scale + offsetY;
         
         // Get offsets from MeasurementStyles
         const padXOffset = typeof MeasurementStyles !== 'undefined' 
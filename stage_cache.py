@@ -0,0 +1,76 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import trimesh
+
+# In-memory LRU cache of intermediate generation results.
+#
+# build_model runs as a chain of stages, each keyed on the key of the stage
+# it builds on plus only the parameters it reads, so changing one parameter
+# rebuilds just the stages that depend on it. Entries are evicted least
+# recently used first once the arrays they hold exceed CACHE_MAX_BYTES;
+# a result larger than the whole budget is returned without being stored.
+
+CACHE_MAX_BYTES = int(os.environ.get('PILLARS_STAGE_CACHE_MAX_BYTES', 512 * 1024 ** 2))
+
+_entries = OrderedDict()  # key -> (value, nbytes)
+_total = 0
+_lock = threading.Lock()
+_stats = {}  # stage name -> {'hit': count, 'miss': count}
+
+def _nbytes(value):
+    """Approximate memory held by a stage result"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, trimesh.Trimesh):
+        return value.vertices.nbytes + value.faces.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(v) for v in value)
+    if hasattr(value, '__dataclass_fields__'):
+        return sum(_nbytes(getattr(value, name)) for name in value.__dataclass_fields__)
+    return 0
+
+def memoize(key, build):
+    """
+    Cached stage result, building and storing it on a miss
+
+    Args:
+        key: hashable stage key, starting with the stage name
+        build: called with no arguments to compute the result
+    """
+    global _total
+    with _lock:
+        counts = _stats.setdefault(key[0], {'hit': 0, 'miss': 0})
+        if key in _entries:
+            _entries.move_to_end(key)
+            counts['hit'] += 1
+            return _entries[key][0]
+        counts['miss'] += 1
+
+    value = build()
+    size = _nbytes(value)
+    if size > CACHE_MAX_BYTES:
+        return value
+
+    with _lock:
+        if key not in _entries:
+            _entries[key] = (value, size)
+            _total += size
+        while _total > CACHE_MAX_BYTES:
+            _, (_, evicted) = _entries.popitem(last=False)
+            _total -= evicted
+    return value
+
+def stage_cache_stats():
+    """Hit and miss counts per stage name since startup"""
+    with _lock:
+        return {name: dict(counts) for name, counts in _stats.items()}
+
+def clear_stage_cache():
+    """Drop every cached stage result"""
+    global _total
+    with _lock:
+        _entries.clear()
+        _total = 0
@@ -30,7 +30,8 @@ const State = {
         zoom: 0.85,
         showMeasurements: false,
         isGenerating: false,
-        linkPadding: true
+        linkPadding: true,
+        skipClearanceCheck: false
     },
     
     // Dimension locks
@@ -51,6 +52,7 @@ const State = {
     setPreviewData(data) {
         this.previewData = data;
     },
+
     
     setUIState(key, value) {
         this.ui[key] = value;
@@ -87,7 +89,12 @@ const State = {
             hole_probability: parseFloat(this.parameters.holeProb),
             jitter: parseFloat(this.parameters.jitter),
             lloyd_iterations: parseInt(this.parameters.lloydIterations),  // ADD THIS
-            seed: parseInt(this.parameters.seed)
+            seed: parseInt(this.parameters.seed),
+            // Locked dimensions override the padding; the server solves it
+            target_width: this.isLocked('width') ? this.getLockTarget('width') : null,
+            target_height: this.isLocked('height') ? this.getLockTarget('height') : null,
+            // Overlapping layouts are rejected before generation unless skipped
+            clearance_check: !this.ui.skipClearanceCheck
         };
     },
     
@@ -95,18 +102,20 @@ const State = {
     getStatistics() {
         if (!this.previewData) return null;
         
-        const { pillars, holes, bounds } = this.previewData;
+        const { pillars, holes, bounds, counts } = this.previewData;
+        const pillarCount = counts ? counts.pillars : pillars.length;
+        const holeCount = counts ? counts.holes : holes.length;
         const innerWidth = bounds.maxX - bounds.minX;
         const innerHeight = bounds.maxY - bounds.minY;
         const wt = this.parameters.wallThickness;
         const totalWidth = innerWidth + 2 * wt;
         const totalHeight = innerHeight + 2 * wt;
         const totalHeightZ = this.parameters.floorThickness + this.parameters.pillarHeight;
-        const density = pillars.length / (innerWidth * innerHeight);
+        const density = pillarCount / (innerWidth * innerHeight);
         
         return {
-            pillarCount: pillars.length,
-            holeCount: holes.length,
+            pillarCount,
+            holeCount,
             innerDimensions: { width: innerWidth, height: innerHeight },
             totalDimensions: { width: totalWidth, height: totalHeight },
             totalHeightZ,
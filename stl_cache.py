@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+# Content-addressed on-disk cache for generated STL files.
+#
+# Entries are keyed on a hash of the normalized /generate parameters plus
+# the geometry version (see pipeline.result_params), and stored as
+# <key>.stl with a <key>.json sidecar holding response metadata. A file's
+# mtime is its last use; when the directory grows past CACHE_MAX_BYTES the
+# least recently used entries are removed.
+
+CACHE_DIR = os.environ.get(
+    'PILLARS_STL_CACHE_DIR',
+    os.path.join(tempfile.gettempdir(), 'pillars-grid-stl-cache')
+)
+CACHE_MAX_BYTES = int(os.environ.get('PILLARS_STL_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+
+_lock = threading.Lock()
+
+def cache_key(params):
+    """Canonical hash of a normalized parameter dict"""
+    canonical = json.dumps(params, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+def _paths(key):
+    return os.path.join(CACHE_DIR, key + '.stl'), os.path.join(CACHE_DIR, key + '.json')
+
+def cache_get(key):
+    """
+    Look up a cached STL
+
+    Returns:
+        (stl_path, metadata) on a hit, None on a miss
+    """
+    stl_path, meta_path = _paths(key)
+    try:
+        with open(meta_path) as f:
+            metadata = json.load(f)
+        os.utime(stl_path)
+    except (OSError, ValueError):
+        return None
+    return stl_path, metadata
+
+def _write_entry(key, chunks, metadata):
+    """Write chunks to a temporary file, passing them through, then commit"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    stl_path, meta_path = _paths(key)
+    fd, tmp_stl = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+    tmp_meta = None
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+                yield chunk
+        fd, tmp_meta = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(metadata, f)
+        os.replace(tmp_stl, stl_path)
+        os.replace(tmp_meta, meta_path)
+    finally:
+        for path in (tmp_stl, tmp_meta):
+            if path and os.path.exists(path):
+                os.remove(path)
+    _evict_if_needed()
+
+def cache_put(key, data, metadata):
+    """Store a complete STL file"""
+    for _ in _write_entry(key, [data], metadata):
+        pass
+
+def cache_stream(key, chunks, metadata):
+    """
+    Pass a streamed STL through while writing it into the cache
+
+    The entry only becomes visible once every chunk has been written, so a
+    cancelled or failed export never leaves a partial file behind.
+    """
+    yield from _write_entry(key, chunks, metadata)
+
+def _evict_if_needed():
+    """Remove least recently used entries until the cache fits its budget"""
+    with _lock:
+        try:
+            names = [n for n in os.listdir(CACHE_DIR) if n.endswith('.stl')]
+        except OSError:
+            return
+        entries = []
+        for name in names:
+            try:
+                stat = os.stat(os.path.join(CACHE_DIR, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name[:-4]))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if total <= CACHE_MAX_BYTES:
+                break
+            for path in _paths(key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+
+def clear_stl_cache():
+    """Remove every cached STL"""
+    with _lock:
+        if not os.path.isdir(CACHE_DIR):
+            return
+        for name in os.listdir(CACHE_DIR):
+            os.remove(os.path.join(CACHE_DIR, name))
@@ -0,0 +1,47 @@
+import numpy as np
+
+# Binary STL record: normal, three vertices, attribute byte count
+STL_RECORD = np.dtype([
+    ('normal', '<f4', (3,)),
+    ('vertices', '<f4', (3, 3)),
+    ('attributes', '<u2')
+])
+
+def stl_header(n_triangles, name=b'pillar_grid'):
+    """80-byte binary STL header followed by the triangle count"""
+    return name[:80].ljust(80, b'\0') + np.uint32(n_triangles).tobytes()
+
+def stl_records(vertices, faces):
+    """Pack triangles (faces indexing into vertices) as binary STL records"""
+    triangles = np.asarray(vertices, dtype=np.float64)[faces]
+    normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    np.divide(normals, lengths, out=normals, where=lengths > 0)
+
+    records = np.zeros(len(faces), dtype=STL_RECORD)
+    records['normal'] = normals
+    records['vertices'] = triangles
+    return records.tobytes()
+
+def stl_size(n_triangles):
+    """Size in bytes of a binary STL file with n_triangles"""
+    return 84 + STL_RECORD.itemsize * n_triangles
+
+def mesh_chunks(vertices, faces, batch_size=100000):
+    """Split one mesh into (vertices, faces) chunks of at most batch_size triangles"""
+    for start in range(0, len(faces), batch_size):
+        yield vertices, faces[start:start + batch_size]
+
+def stream_stl(n_triangles, chunks):
+    """
+    Yield a binary STL file piece by piece
+
+    Args:
+        n_triangles: total triangle count, written to the header up front
+        chunks: iterable of (vertices, faces) pairs that together hold
+            exactly n_triangles faces
+    """
+    yield stl_header(n_triangles)
+    for vertices, faces in chunks:
+        if len(faces):
+            yield stl_records(vertices, faces)
@@ -0,0 +1,55 @@
+import numpy as np
+
+# Circle tessellation policy.
+#
+# Pillars and holes are polygons with one segment count per model: the
+# fewest segments whose chord error (the largest gap between a segment and
+# its arc) stays within the tolerance for the larger radius in use. A
+# triangle budget lowers the count further until the model's estimated
+# triangle count fits.
+
+MIN_SECTIONS = 6
+MAX_SECTIONS = 128
+
+# Estimated triangles of one pillar or hole: per segment (walls, cap and the
+# floor zipped to its circle) and per site (its Voronoi cell edges)
+_TRIANGLES_PER_SECTION = 4
+_TRIANGLES_PER_SITE = 12
+
+# Estimated triangles per segment of the base mesh alone (floor and rim,
+# pillars left out): the floor zipped to a pillar ring, and the floor zipped
+# to both ends of a hole plus its wall
+_BASE_TRIANGLES_PER_PILLAR_SECTION = 1
+_BASE_TRIANGLES_PER_HOLE_SECTION = 4
+
+
+def chord_sections(radius, chord_tolerance):
+    """Fewest segments keeping a circle of radius within chord_tolerance of its arc"""
+    if chord_tolerance >= radius:
+        return MIN_SECTIONS
+    # Chord error of n segments: radius * (1 - cos(pi / n))
+    sections = np.ceil(np.pi / np.arccos(1 - chord_tolerance / radius) - 1e-9)
+    return int(np.clip(sections, MIN_SECTIONS, MAX_SECTIONS))
+
+def model_sections(pillar_radius, hole_radius, n_pillars, n_holes, chord_tolerance, triangle_budget=None):
+    """
+    Segment count for every pillar and hole circle of a model
+
+    Args:
+        n_pillars, n_holes: circle counts; a radius with no circles is ignored
+        chord_tolerance: largest allowed chord error
+        triangle_budget: approximate triangle count of the whole model to
+            stay within, down to MIN_SECTIONS (optional)
+    """
+    radii = [radius for radius, n in ((pillar_radius, n_pillars), (hole_radius, n_holes)) if n]
+    sections = max((chord_sections(radius, chord_tolerance) for radius in radii), default=MIN_SECTIONS)
+    if triangle_budget:
+        per_site = triangle_budget / max(n_pillars + n_holes, 1)
+        fit = int((per_site - _TRIANGLES_PER_SITE) // _TRIANGLES_PER_SECTION)
+        sections = max(MIN_SECTIONS, min(sections, fit))
+    return sections
+
+def base_triangles(n_pillars, n_holes, sections):
+    """Estimated triangle count of the floor and rim of a directly assembled model, pillars left out"""
+    return (n_pillars * (sections * _BASE_TRIANGLES_PER_PILLAR_SECTION + _TRIANGLES_PER_SITE)
+            + n_holes * (sections * _BASE_TRIANGLES_PER_HOLE_SECTION + _TRIANGLES_PER_SITE))
@@ -0,0 +1,31 @@
+import pytest
+
+from pipeline import build_model, resolve_generate_params
+
+# Direct assembly over a range of grid sizes: the floor and rim are stitched
+# without CSG, so any misplaced boundary vertex shows up as a mesh that is
+# not closed or not consistently wound. Sizes where rows != cols put the
+# floor corners at coordinates whose perimeter sums do not round exactly.
+
+LAYOUTS = ('square-checkerboard', 'hex-checkerboard', 'hex-honeycomb')
+SIZES = [(n, n) for n in (1, 2, 5, 10)] + [(n, n + 1) for n in (3, 7, 12, 24, 27, 51)]
+
+
+@pytest.mark.parametrize('layout_type', LAYOUTS)
+@pytest.mark.parametrize('rows, cols', SIZES)
+def test_direct_assembly_is_closed(layout_type, rows, cols):
+    params = resolve_generate_params({'layout_type': layout_type, 'rows': rows, 'cols': cols})
+    generated = build_model(params)
+    assert generated.assembly == 'direct'
+    assert generated.model.is_watertight
+    assert generated.model.is_winding_consistent
+
+
+@pytest.mark.parametrize('wall_thickness', [0.0, 0.5])
+def test_capped_base_is_closed(wall_thickness):
+    # 3MF leaves the pillars out and caps their rings, so the base closes on its own
+    params = resolve_generate_params({'layout_type': 'hex-checkerboard', 'rows': 24, 'cols': 25,
+                                      'format': '3mf', 'wall_thickness': wall_thickness})
+    model = build_model(params).model
+    assert model.is_watertight
+    assert model.is_winding_consistent
@@ -0,0 +1,57 @@
+import io
+import json
+import zipfile
+
+import pytest
+
+import batch
+from batch import expand_batch, stream_batch
+
+
+def test_expand_crosses_variants_with_sweep():
+    variants = expand_batch({
+        'base': {'rows': 4, 'cols': 4},
+        'variants': [{'layout_type': 'square-checkerboard'}, {'layout_type': 'hex-checkerboard'}],
+        'sweep': {'pillar_height': [5.0, 6.0, 7.0]}
+    })
+    assert len(variants) == 6
+    assert [(v['layout_type'], v['pillar_height']) for v in variants[:3]] == [
+        ('square-checkerboard', 5.0), ('square-checkerboard', 6.0), ('square-checkerboard', 7.0)
+    ]
+    assert all(v['rows'] == 4 and not v['stream'] for v in variants)
+
+def test_expand_caps_variant_count(monkeypatch):
+    monkeypatch.setattr(batch, 'MAX_BATCH_VARIANTS', 6)
+    assert len(expand_batch({'variants': [{}, {}], 'sweep': {'rows': [2, 3, 4]}})) == 6
+    with pytest.raises(ValueError, match='7 variants, at most 6'):
+        expand_batch({'sweep': {'rows': list(range(1, 8))}})
+
+@pytest.mark.parametrize('body', [
+    {'base': [1]},
+    {'variants': [1]},
+    {'sweep': {'rows': []}},
+    {'base': {'format': 'obj'}}
+])
+def test_expand_rejects_malformed_requests(body):
+    with pytest.raises(ValueError):
+        expand_batch(body)
+
+def test_manifest_records_failed_variants():
+    variants = expand_batch({
+        'base': {'rows': 4, 'cols': 4, 'cache': False},
+        'variants': [
+            {'pillar_height': 3.0},
+            {'layout_type': 'no-such-layout'},
+            # Pillars overlap their neighbours
+            {'layout_type': 'organic', 'rows': 10, 'cols': 10, 'jitter': 0.2},
+            {'pillar_height': 3.0}
+        ]
+    })
+    archive = zipfile.ZipFile(io.BytesIO(b''.join(stream_batch(variants))))
+    manifest = json.loads(archive.read('manifest.json'))
+
+    assert [entry['file'] is not None for entry in manifest] == [True, False, False, True]
+    assert 'no-such-layout' in manifest[1]['error']
+    assert manifest[2]['error'].startswith('clearance check failed')
+    assert manifest[0]['dimensions'] == manifest[3]['dimensions']
+    assert sorted(archive.namelist()) == sorted([manifest[0]['file'], manifest[3]['file'], 'manifest.json'])
@@ -0,0 +1,57 @@
+import pytest
+
+from clearance import check_clearances, clearance_error
+from layouts import generate_layout
+from pipeline import check_model, resolve_generate_params
+
+BOUNDS = (0.0, 10.0, 0.0, 10.0)
+
+
+def test_clear_layout_passes():
+    pillars = [(2.0, 2.0), (2.0, 4.0), (4.0, 2.0)]
+    holes = [(4.0, 4.0)]
+    report = check_clearances(pillars, holes, BOUNDS, 0.5, 0.25)
+    assert report['ok']
+    assert report['pillar_pillar']['min_gap'] == pytest.approx(1.0)
+    assert report['pillar_hole']['min_gap'] == pytest.approx(2.0 - 0.75)
+    assert report['edge']['min_gap'] == pytest.approx(1.5)
+    assert all(report[name]['violations'] == 0 for name in ('pillar_pillar', 'pillar_hole', 'edge'))
+
+def test_overlapping_pillars_fail():
+    pillars = [(2.0, 2.0), (2.8, 2.0), (6.0, 6.0)]
+    report = check_clearances(pillars, [], BOUNDS, 0.5, 0.25)
+    assert not report['ok']
+    check = report['pillar_pillar']
+    assert check['min_gap'] == pytest.approx(-0.2)
+    # Counted once per pillar of the pair
+    assert check['violations'] == 2
+    assert check['at'] in ([2.0, 2.0], [2.8, 2.0])
+    assert report['pillar_hole'] == {'ok': True, 'violations': 0, 'min_gap': None, 'at': None}
+    assert 'pillar to pillar gap -0.200 mm' in clearance_error(report)
+
+def test_pillar_cutting_hole_and_edge_fail():
+    report = check_clearances([(5.0, 5.0)], [(5.5, 5.0), (9.9, 5.0)], BOUNDS, 0.5, 0.25)
+    assert not report['pillar_hole']['ok']
+    assert report['pillar_hole']['min_gap'] == pytest.approx(-0.25)
+    assert not report['edge']['ok']
+    assert report['edge']['min_gap'] == pytest.approx(-0.15)
+    assert report['edge']['at'] == [9.9, 5.0]
+    assert report['pillar_pillar']['ok']
+
+def test_min_clearance_applies_to_touching_circles():
+    pillars = [(2.0, 2.0), (3.0, 2.0)]
+    assert check_clearances(pillars, [], BOUNDS, 0.5, 0.25)['ok']
+    report = check_clearances(pillars, [], BOUNDS, 0.5, 0.25, min_clearance=0.1)
+    assert not report['ok']
+    assert report['min_clearance'] == 0.1
+
+def test_regular_layouts_pass_and_jittered_overlaps_fail():
+    assert check_model(resolve_generate_params({'rows': 20, 'cols': 20}))['ok']
+    params = resolve_generate_params({'layout_type': 'organic', 'rows': 20, 'cols': 20, 'jitter': 0.2})
+    assert not check_model(params)['pillar_pillar']['ok']
+
+def test_layout_positions_match_report():
+    layout = generate_layout('square-checkerboard', 4, 4, 1.0)
+    report = check_clearances(layout.pillars, layout.holes, (-1.0, 4.0, -1.0, 4.0), 0.25, 0.25)
+    assert report['ok']
+    assert report['pillar_hole']['min_gap'] == pytest.approx(0.5)
@@ -0,0 +1,32 @@
+import pytest
+
+from geometry import create_floor_with_holes
+from layouts import generate_layout
+
+# Tiled floors are cut and triangulated tile by tile, then welded along the
+# seams; they must close exactly like the untiled slab. Segment counts whose
+# hole vertices land on a seam (12 on a 0.35 mm grid) are included.
+
+LAYOUTS = ('square-checkerboard', 'hex-checkerboard')
+SIZES = (20, 40, 60)
+SECTIONS = (12, 32, 64)
+
+
+@pytest.mark.parametrize('layout_type', LAYOUTS)
+@pytest.mark.parametrize('size', SIZES)
+@pytest.mark.parametrize('sections', SECTIONS)
+def test_tiled_floor_is_closed(layout_type, size, sections):
+    layout = generate_layout(layout_type, size, size, 0.35)
+    floor = create_floor_with_holes(layout.holes, 2.0, 0.25, 0.25, 0.1, bounds_positions=layout.positions,
+                                    tile_size=5.0, sections=sections)
+    assert floor.is_watertight
+    assert floor.is_winding_consistent
+
+
+@pytest.mark.parametrize('layout_type', LAYOUTS)
+def test_tiled_floor_matches_untiled(layout_type):
+    layout = generate_layout(layout_type, 40, 40, 0.35)
+    args = (layout.holes, 2.0, 0.25, 0.25, 0.1)
+    untiled = create_floor_with_holes(*args, bounds_positions=layout.positions, sections=12)
+    tiled = create_floor_with_holes(*args, bounds_positions=layout.positions, tile_size=5.0, sections=12)
+    assert tiled.volume == pytest.approx(untiled.volume)
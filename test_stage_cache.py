@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+import stage_cache
+from stage_cache import memoize, clear_stage_cache
+
+# 100 float64s, 800 bytes per entry; the budget holds three
+ENTRY_BYTES = 800
+
+
+@pytest.fixture(autouse=True)
+def budget(monkeypatch):
+    monkeypatch.setattr(stage_cache, 'CACHE_MAX_BYTES', 3 * ENTRY_BYTES)
+    clear_stage_cache()
+    yield
+    clear_stage_cache()
+
+
+class Builds:
+    """Build functions that count their calls per key"""
+
+    def __init__(self):
+        self.calls = {}
+
+    def __call__(self, key, size=ENTRY_BYTES):
+        def build():
+            self.calls[key] = self.calls.get(key, 0) + 1
+            return np.zeros(size // 8)
+        return memoize(key, build)
+
+
+def test_evicts_least_recently_used_over_budget():
+    builds = Builds()
+    for i in range(3):
+        builds(('test', i))
+    builds(('test', 0))  # now most recently used
+    builds(('test', 3))  # evicts ('test', 1)
+    assert stage_cache._total == 3 * ENTRY_BYTES
+
+    for i in (0, 2, 3):
+        builds(('test', i))
+    assert builds.calls == {('test', 0): 1, ('test', 1): 1, ('test', 2): 1, ('test', 3): 1}
+    builds(('test', 1))
+    assert builds.calls[('test', 1)] == 2
+
+def test_evicts_as_many_entries_as_needed():
+    builds = Builds()
+    for i in range(3):
+        builds(('test', i))
+    builds(('test', 'large'), size=2 * ENTRY_BYTES)
+    assert list(stage_cache._entries) == [('test', 2), ('test', 'large')]
+    assert stage_cache._total == 3 * ENTRY_BYTES
+
+def test_result_over_budget_is_not_stored():
+    builds = Builds()
+    builds(('test', 0))
+    value = builds(('test', 'huge'), size=4 * ENTRY_BYTES)
+    assert value.nbytes == 4 * ENTRY_BYTES
+    assert list(stage_cache._entries) == [('test', 0)]
+    builds(('test', 'huge'), size=4 * ENTRY_BYTES)
+    assert builds.calls[('test', 'huge')] == 2
+
+def test_counts_hits_and_misses_per_stage():
+    before = stage_cache.stage_cache_stats().get('counted', {'hit': 0, 'miss': 0})
+    builds = Builds()
+    builds(('counted', 0))
+    builds(('counted', 0))
+    after = stage_cache.stage_cache_stats()['counted']
+    assert after['miss'] - before['miss'] == 1
+    assert after['hit'] - before['hit'] == 1
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+import voronoi_cache
+from layouts import generate_voronoi_layout
+
+# Relaxation resumed from a stored state, or cut short by the displacement
+# history, must give exactly the points a fresh run gives.
+
+ARGS = dict(rows=12, cols=12, spacing=0.35, seed=7)
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(voronoi_cache, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(voronoi_cache, 'CHECKPOINT_INTERVAL', 5)
+    voronoi_cache.clear(disk=False)
+    yield
+    voronoi_cache.clear(disk=False)
+
+
+def fresh(**kwargs):
+    voronoi_cache.clear()
+    return generate_voronoi_layout(**ARGS, **kwargs)
+
+def lookups(before):
+    after = voronoi_cache.stats()
+    return {name: after[name] - before[name] for name in after}
+
+def only_entry():
+    (entry,) = voronoi_cache._entries.values()
+    return entry
+
+
+@pytest.mark.parametrize('first', [3, 5, 8])
+def test_resume_matches_fresh_run(first):
+    expected = fresh(lloyd_iterations=12)
+    voronoi_cache.clear()
+    generate_voronoi_layout(**ARGS, lloyd_iterations=first)
+
+    before = voronoi_cache.stats()
+    resumed = generate_voronoi_layout(**ARGS, lloyd_iterations=12)
+    assert lookups(before)['partial'] == 1
+    np.testing.assert_array_equal(resumed.positions, expected.positions)
+    np.testing.assert_array_equal(resumed.is_pillar, expected.is_pillar)
+
+def test_hit_after_restart_matches_fresh_run():
+    expected = fresh(lloyd_iterations=7)
+    voronoi_cache.clear(disk=False)
+
+    before = voronoi_cache.stats()
+    reloaded = generate_voronoi_layout(**ARGS, lloyd_iterations=7)
+    assert lookups(before)['hit'] == 1
+    np.testing.assert_array_equal(reloaded.positions, expected.positions)
+
+def test_tolerance_stop_matches_fresh_run():
+    voronoi_cache.clear()
+    generate_voronoi_layout(**ARGS, lloyd_iterations=40)
+    displacements = only_entry()['displacements']
+    # Stops after the 10th iteration
+    tolerance = float(displacements[9])
+    assert (displacements[:9] > tolerance).all()
+
+    # The displacement history of the longer run ends a tolerance run at
+    # its checkpoint without relaxing again
+    before = voronoi_cache.stats()
+    from_history = generate_voronoi_layout(**ARGS, lloyd_iterations=40, lloyd_tolerance=tolerance)
+    assert lookups(before)['hit'] == 1
+
+    expected = fresh(lloyd_iterations=40, lloyd_tolerance=tolerance)
+    assert max(only_entry()['points']) == 10
+    np.testing.assert_array_equal(from_history.positions, expected.positions)
+
+    # A stopped run is served from its own final state, whatever the limit
+    for iterations in (40, 60):
+        before = voronoi_cache.stats()
+        cached = generate_voronoi_layout(**ARGS, lloyd_iterations=iterations, lloyd_tolerance=tolerance)
+        assert lookups(before)['hit'] == 1
+        np.testing.assert_array_equal(cached.positions, expected.positions)
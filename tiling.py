@@ -0,0 +1,248 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import shapely
+import trimesh
+from scipy.sparse import coo_matrix
+from scipy.spatial import cKDTree
+from scipy.sparse.csgraph import connected_components
+
+from assembly import clipped_voronoi_cells, conflicting_pairs
+from geometry import create_pillars_from_positions, extrude_polygons, hole_circles
+
+# Tile-parallel boolean assembly.
+#
+# Sites (pillar and hole centers) are split into square tiles along the
+# edges of their Voronoi cells. Every group of conflicting circles (see
+# conflicting_pairs) goes to one tile, so no pillar or hole crosses a seam.
+# The rim is split the same way, into quads outside each boundary cell edge
+# and the four corner squares. Each tile's floor section, rim section and
+# pillars are unioned in a worker process, and the tiles are welded by
+# dropping the faces on their shared seams. Seams are matched exactly
+# because every tile is cut from the same cell vertices, and the boolean
+# engine rounds its output to float32 the same way for each tile.
+
+# Tiles run in-process inside another pool's worker (generation jobs and
+# batches), which already has one process per core
+TILE_WORKERS = int(os.environ.get('PILLARS_TILE_WORKERS', os.cpu_count() or 1))
+
+_executor = None
+_pool_lock = threading.Lock()
+
+def _pool():
+    """Create the worker pool on first use"""
+    global _executor
+    with _pool_lock:
+        if _executor is None:
+            context = multiprocessing.get_context('spawn')
+            _executor = ProcessPoolExecutor(max_workers=TILE_WORKERS, mp_context=context)
+        return _executor
+
+def _cell_next(group):
+    """Index of the next vertex entry within each cell, wrapping around"""
+    idx = np.arange(len(group))
+    starts = np.searchsorted(group, group)
+    ends = np.searchsorted(group, group, side='right')
+    return np.where(idx + 1 < ends, idx + 1, starts)
+
+def _rim_pieces(coords, group, ids, bounds, wall_thickness):
+    """
+    Split the rim into one quad outside each boundary cell edge and the
+    four corner squares
+
+    Returns:
+        coords: cell vertices followed by the rim's outer points
+        owners: (P,) owning site of each piece
+        pieces: (P, 4) vertex ids of each piece
+    """
+    min_x, max_x, min_y, max_y = bounds
+    a, b = ids, ids[_cell_next(group)]
+    sides = ((1, min_y, -wall_thickness), (0, max_x, wall_thickness),
+             (1, max_y, wall_thickness), (0, min_x, -wall_thickness))
+
+    points, owners, pieces, outer = [coords], [], [], []
+    count = len(coords)
+    for axis, value, offset in sides:
+        on = (coords[a, axis] == value) & (coords[b, axis] == value)
+        verts = np.unique(np.r_[a[on], b[on]])
+        out = coords[verts].copy()
+        out[:, axis] = value + offset
+        out_ids = count + np.arange(len(verts))
+        points.append(out)
+        count += len(verts)
+
+        out_a = out_ids[np.searchsorted(verts, a[on])]
+        out_b = out_ids[np.searchsorted(verts, b[on])]
+        owners.append(group[on])
+        pieces.append(np.column_stack([a[on], b[on], out_b, out_a]))
+        outer.append((verts, out_ids))
+
+    # Corner squares, each owned by the cell holding that floor corner
+    corners = [(min_x, min_y), (max_x, min_y), (max_x, max_y), (min_x, max_y)]
+    signs = [(-1, -1), (1, -1), (1, 1), (-1, 1)]
+    for k, ((cx, cy), (sx, sy)) in enumerate(zip(corners, signs)):
+        corner = np.flatnonzero((coords[:, 0] == cx) & (coords[:, 1] == cy))[0]
+        before_verts, before_ids = outer[k - 1]
+        after_verts, after_ids = outer[k]
+        points.append([[cx + sx * wall_thickness, cy + sy * wall_thickness]])
+        owners.append(group[ids == corner][:1])
+        pieces.append([[
+            corner,
+            before_ids[np.searchsorted(before_verts, corner)],
+            count,
+            after_ids[np.searchsorted(after_verts, corner)]
+        ]])
+        count += 1
+
+    return np.vstack(points), np.concatenate(owners), np.vstack(pieces)
+
+def build_tile(pillars, holes, cell_coords, cell_index, rim_coords, rim_index,
+               pillar_radius, pillar_height, hole_radius, floor_thickness, sections=32):
+    """
+    Union one tile's floor section, rim section and pillars
+
+    Args:
+        pillars: (x, y) pillar centers in the tile
+        holes: (x, y) hole centers in the tile
+        cell_coords, cell_index: vertices of the tile's cells and the cell
+            each belongs to, as for shapely.linearrings
+        rim_coords, rim_index: the same for the tile's rim pieces
+        sections: segments per pillar and hole circle
+
+    Returns:
+        (vertices, faces) of the tile solid
+    """
+    cells = shapely.polygons(shapely.linearrings(cell_coords, indices=cell_index))
+    floor = shapely.union_all(cells)
+    if len(holes):
+        floor = floor.difference(shapely.union_all(hole_circles(holes, hole_radius, sections)))
+
+    parts = [extrude_polygons(floor, floor_thickness)]
+    if len(rim_index):
+        rim = shapely.polygons(shapely.linearrings(rim_coords, indices=rim_index))
+        parts.append(extrude_polygons(shapely.union_all(rim), floor_thickness + pillar_height))
+
+    # Overlapping pillars go in as separate meshes so the union merges them
+    overlapping = np.zeros(len(pillars), dtype=bool)
+    if len(pillars) > 1:
+        overlapping[cKDTree(pillars).query_pairs(2 * pillar_radius, output_type='ndarray').ravel()] = True
+    if np.any(~overlapping):
+        parts.append(create_pillars_from_positions(pillars[~overlapping], pillar_radius, pillar_height,
+                                                   floor_thickness, sections))
+    parts += [
+        create_pillars_from_positions(position[None], pillar_radius, pillar_height, floor_thickness, sections)
+        for position in pillars[overlapping]
+    ]
+
+    mesh = trimesh.boolean.union(parts) if len(parts) > 1 else parts[0]
+    return mesh.vertices, mesh.faces
+
+def _xy_keys(xy):
+    """Exact integer key of float32 (x, y) pairs"""
+    return np.ascontiguousarray(xy, dtype=np.float32).view(np.int64).ravel()
+
+def build_tiled(pillar_positions, hole_positions, bounds, pillar_radius, pillar_height,
+                hole_radius, floor_thickness, wall_thickness=0.5, tile_size=10.0, sections=32):
+    """
+    Build the pillar grid (floor, holes, pillars and rim) tile by tile across
+    a process pool
+
+    Args:
+        pillar_positions: (x, y) pillar centers
+        hole_positions: (x, y) hole centers
+        bounds: (min_x, max_x, min_y, max_y) of the floor
+        wall_thickness: rim thickness around the floor, 0 for no rim
+        tile_size: side length of the square tiles
+        sections: segments per pillar and hole circle
+
+    Returns:
+        trimesh.Trimesh of the whole model
+    """
+    pillars = np.asarray(pillar_positions, dtype=float).reshape(-1, 2)
+    holes = np.asarray(hole_positions, dtype=float).reshape(-1, 2)
+    sites = np.vstack([pillars, holes])
+    n_pillars, n_sites = len(pillars), len(sites)
+    radii = np.r_[np.full(n_pillars, pillar_radius), np.full(len(holes), hole_radius)]
+    min_x, max_x, min_y, max_y = bounds
+
+    coords, group, ids = clipped_voronoi_cells(sites, bounds)
+
+    # Round the cell vertices to float32, as the boolean engine will, so
+    # vertices it would merge are merged up front for every tile alike
+    coords, index = np.unique(coords.astype(np.float32), axis=0, return_inverse=True)
+    coords = coords.astype(float)
+    ids = index.reshape(-1)[ids]
+    keep = ids != ids[_cell_next(group)]
+    ids, group = ids[keep], group[keep]
+    bounds = tuple(np.asarray(bounds, dtype=np.float32).astype(float))
+    owners, pieces = np.empty(0, dtype=np.intp), np.empty((0, 4), dtype=np.intp)
+    if wall_thickness > 0:
+        coords, owners, pieces = _rim_pieces(coords, group, ids, bounds, wall_thickness)
+
+    # Assign each group of conflicting circles to the tile of its first site
+    pairs = conflicting_pairs(sites, radii)
+    adjacency = coo_matrix((np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])), shape=(n_sites, n_sites))
+    _, cluster = connected_components(adjacency, directed=False)
+    _, first = np.unique(cluster, return_index=True)
+    n_ty = int(np.ceil((max_y - min_y) / tile_size)) or 1
+    tx = ((sites[:, 0] - min_x) // tile_size).astype(np.intp)
+    ty = ((sites[:, 1] - min_y) // tile_size).astype(np.intp)
+    site_tile = (tx * n_ty + ty)[first[cluster]]
+
+    # Seam edges: polygon edges used by two different tiles
+    a = np.r_[ids, pieces.ravel()]
+    b = np.r_[ids[_cell_next(group)], np.roll(pieces, -1, axis=1).ravel()]
+    edge_tile = np.r_[site_tile[group], np.repeat(site_tile[owners], 4)]
+    n_coords = len(coords)
+    edge_keys = np.minimum(a, b) * n_coords + np.maximum(a, b)
+    edge_keys, edge_tile = np.unique(np.column_stack([edge_keys, edge_tile]), axis=0).T
+    seam_edges = np.unique(edge_keys[np.r_[edge_keys[1:] == edge_keys[:-1], False]])
+    seam_vertices = np.unique(np.r_[seam_edges // n_coords, seam_edges % n_coords])
+
+    # Tile tasks
+    tasks = []
+    for tile in np.unique(site_tile):
+        in_tile = site_tile == tile
+        cell_mask = in_tile[group]
+        rim_mask = in_tile[owners]
+        tasks.append((
+            pillars[in_tile[:n_pillars]], holes[in_tile[n_pillars:]],
+            coords[ids[cell_mask]], np.unique(group[cell_mask], return_inverse=True)[1],
+            coords[pieces[rim_mask].ravel()], np.repeat(np.arange(rim_mask.sum()), 4),
+            pillar_radius, pillar_height, hole_radius, floor_thickness, sections
+        ))
+
+    if TILE_WORKERS > 1 and len(tasks) > 1 and multiprocessing.parent_process() is None:
+        results = list(_pool().map(build_tile, *zip(*tasks)))
+    else:
+        results = [build_tile(*task) for task in tasks]
+
+    offsets = np.cumsum([0] + [len(v) for v, _ in results])
+    vertices = np.vstack([v for v, _ in results])
+    faces = np.vstack([f + offset for (_, f), offset in zip(results, offsets)])
+
+    # Drop vertical faces lying on a seam edge, then merge the seam vertices
+    on_seam = np.zeros(len(faces), dtype=bool)
+    if len(seam_edges):
+        seam_keys = _xy_keys(coords[seam_vertices])
+        order = np.argsort(seam_keys)
+        seam_keys, seam_vertices = seam_keys[order], seam_vertices[order]
+        keys = _xy_keys(vertices[:, :2])
+        pos = np.minimum(np.searchsorted(seam_keys, keys), len(seam_keys) - 1)
+        corners = np.where(seam_keys[pos] == keys, seam_vertices[pos], -1)[faces]
+
+        lo, hi = corners.min(axis=1), corners.max(axis=1)
+        distinct = ((corners[:, 0] != corners[:, 1]).astype(int) + (corners[:, 1] != corners[:, 2]) +
+                    (corners[:, 0] != corners[:, 2]))
+        on_seam = (lo >= 0) & (distinct == 2) & np.isin(lo * n_coords + hi, seam_edges)
+
+    unique, index = np.unique(vertices, axis=0, return_inverse=True)
+    model = trimesh.Trimesh(vertices=unique, faces=index.reshape(-1)[faces[~on_seam]], process=False)
+    if model.is_watertight and model.is_winding_consistent:
+        return model
+
+    # Seams that did not line up fall back to a union of the tiles
+    return trimesh.boolean.union([trimesh.Trimesh(vertices=v, faces=f, process=False) for v, f in results])
@@ -10,9 +10,10 @@ const UIController = {
     
     // Update management
     updateTimer: null,
-    isUpdating: false,
     updateRequestId: 0,
-    pendingUpdate: false,
+    
+    // Grids with more positions than this are previewed a region at a time
+    tiledPreviewPoints: 40000,
     
     /**
      * Initialize the application
@@ -35,47 +36,31 @@ const UIController = {
     
     /**
      * Main update cycle
+     * 
+     * Every update is sent right away, tagged with its request ID; the
+     * server abandons the layout of the one it supersedes. Large grids
+     * fetch only the region visible at the current size and zoom.
      */
     async update() {
-        // If already updating, mark that we need another update and return
-        if (this.isUpdating) {
-            this.pendingUpdate = true;
-            this._showPreviewLoading();
-            return;
-        }
-        
-        this.isUpdating = true;
-        this.pendingUpdate = false;
         this._showPreviewLoading();
         const currentRequestId = ++this.updateRequestId;
         
         try {
-            this._applyDimensionLocks();
-            
             const apiParams = State.getAPIParameters();
-            const data = await API.fetchPreview(apiParams);
+            const data = this._useTiledPreview()
+                ? await API.fetchPreviewRegion(apiParams, this._view(), currentRequestId)
+                : await API.fetchPreview(apiParams, currentRequestId);
             
-            if (currentRequestId !== this.updateRequestId) {
+            if (!data || currentRequestId !== this.updateRequestId) {
                 return;
             }
             
             State.setPreviewData(data);
-            
-            const needsSecondFetch = this._adjustForLocks(data);
-            
-            if (needsSecondFetch) {
-                const newApiParams = State.getAPIParameters();
-                const newData = await API.fetchPreview(newApiParams);
-                
-                if (currentRequestId !== this.updateRequestId) {
-                    return;
-                }
-                
-                State.setPreviewData(newData);
-            }
+            this._syncLockedPadding(data);
             
             this._render();
             this._updateStats();
+            this._updateClearance();
             
         } catch (error) {
             if (currentRequestId === this.updateRequestId) {
@@ -83,18 +68,59 @@ const UIController = {
                 this._showStatus(`Error: ${error.message}`, 'error');
             }
         } finally {
-            this.isUpdating = false;
-            
-            // If changes happened while updating, trigger another update
-            if (this.pendingUpdate) {
-                this.pendingUpdate = false;
-                setTimeout(() => this.update(), 50);
-            } else {
+            if (currentRequestId === this.updateRequestId) {
                 this._hidePreviewLoading();
             }
         }
     },
     
+    /**
+     * Show the clearance report that came with the preview, so layouts
+     * Generate would reject are flagged before it is clicked
+     */
+    _updateClearance() {
+        const element = document.getElementById('statClearance');
+        const report = State.previewData && State.previewData.clearance;
+        const labels = { pillar_pillar: 'pillar–pillar', pillar_hole: 'pillar–hole', edge: 'edge' };
+        
+        if (!report) {
+            element.textContent = '-';
+            element.className = '';
+            return;
+        }
+        const failed = Object.keys(labels).filter(name => !report[name].ok);
+        element.textContent = failed.length
+            ? failed.map(name => 
+                `${labels[name]} ${report[name].min_gap.toFixed(3)} mm (${report[name].violations})`).join(', ')
+            : 'OK';
+        element.className = failed.length ? 'clearance-failed' : '';
+        element.title = failed.length && !State.ui.skipClearanceCheck
+            ? 'Generate will reject this layout unless clearance failures are allowed'
+            : '';
+    },
+    
+    _useTiledPreview() {
+        return State.parameters.rows * State.parameters.cols > this.tiledPreviewPoints;
+    },
+    
+    /**
+     * Canvas size and zoom a region preview is fetched for
+     */
+    _view() {
+        const container = this.canvas.parentElement;
+        return { width: container.clientWidth, height: container.clientHeight, zoom: State.ui.zoom };
+    },
+    
+    /**
+     * Redraw after a view change, fetching the newly visible region of a tiled preview
+     */
+    _viewChanged() {
+        this._render();
+        if (State.previewData && State.previewData.view) {
+            this.scheduleUpdate();
+        }
+    },
+    
     /**
      * Generate and download STL
      */
@@ -103,21 +129,24 @@ const UIController = {
         btn.disabled = true;
         
         const startTime = Date.now();
+        let stage = null;
         const timer = setInterval(() => {
             const elapsed = ((Date.now() - startTime) / 1000).toFixed(1);
-            this._showStatus(`Generating... ${elapsed}s`);
+            this._showStatus(`Generating${stage ? ` (${stage})` : ''}... ${elapsed}s`);
         }, 100);
         
         try {
             const apiParams = State.getAPIParameters();
-            const { blob, metadata } = await API.generateSTL(apiParams);
+            const { blob, metadata } = await API.generateSTL(apiParams, (job) => {
+                stage = job.stage;
+            });
             
             clearInterval(timer);
             
             Exporter.downloadSTL(blob, State.parameters.layoutType);
             
             this._showStatus(
-                `Generated in ${metadata.time}s (${metadata.dimensions})`,
+                `Generated in ${metadata.time}s (${metadata.dimensions}, ${metadata.triangles} triangles)`,
                 'success'
             );
             
@@ -125,7 +154,8 @@ const UIController = {
             
         } catch (error) {
             clearInterval(timer);
-            this._showStatus(`Error: ${error.message}`, 'error');
+            const hint = error.clearance ? " (check 'Generate even if clearances fail' to build anyway)" : '';
+            this._showStatus(`Error: ${error.message}${hint}`, 'error');
             console.error('Generation error:', error);
         } finally {
             btn.disabled = false;
@@ -169,6 +199,7 @@ const UIController = {
             holeProbNum: document.getElementById('holeProbNum'),
             seed: document.getElementById('seed'),
             linkPadding: document.getElementById('linkPadding'),
+            skipClearanceCheck: document.getElementById('skipClearanceCheck'),
             lloydIterations: document.getElementById('lloydIterations'),
             lloydIterationsNum: document.getElementById('lloydIterationsNum'),
             holeProbVoronoi: document.getElementById('holeProbVoronoi'),
@@ -219,7 +250,7 @@ const UIController = {
         this.ctx.scale(dpr, dpr);
         
         if (State.previewData) {
-            this._render();
+            this._viewChanged();
         }
     },
     
@@ -290,12 +321,17 @@ const UIController = {
             State.setUIState('linkPadding', e.target.checked);
         });
         
+        this.elements.skipClearanceCheck.addEventListener('change', (e) => {
+            State.setUIState('skipClearanceCheck', e.target.checked);
+            this._updateClearance();
+        });
+        
         // Zoom control
         this.elements.zoomSlider.addEventListener('input', (e) => {
             State.setUIState('zoom', parseFloat(e.target.value));
             document.getElementById('zoomValue').textContent = 
                 Math.round(State.ui.zoom * 100) + '%';
-            this._render();
+            this._viewChanged();
         });
         
         // Measurements toggle
@@ -396,41 +432,25 @@ const UIController = {
         }
     },
     
-    _applyDimensionLocks() {
-        // This sets initial padding values before fetch
-        // The real adjustment happens in _adjustForLocks after we get data
-    },
-    
-    _adjustForLocks(data) {
-        let changed = false;
+    /**
+     * Show the padding the server solved for locked dimensions
+     * (the floor bounds are already at the lock targets)
+     */
+    _syncLockedPadding(data) {
+        const extent = data.extent || Renderer.pointExtent(Renderer._coords(data.pillars), Renderer._coords(data.holes));
+        const { bounds } = data;
         
         if (State.isLocked('width')) {
-            const target = State.getLockTarget('width');
-            const xValues = [...data.pillars, ...data.holes].map(p => p.x);
-            const rawWidth = Math.max(...xValues) - Math.min(...xValues);
-            const requiredPadding = (target - rawWidth) / 2;
-            
-            if (Math.abs(State.parameters.floorPaddingX - requiredPadding) > 0.00001) {
-                State.setParameter('floorPaddingX', requiredPadding);
-                this._syncPaddingUI('floorPaddingX', requiredPadding);
-                changed = true;
-            }
+            const padding = extent.minX - bounds.minX;
+            State.setParameter('floorPaddingX', padding);
+            this._syncPaddingUI('floorPaddingX', padding);
         }
         
         if (State.isLocked('height')) {
-            const target = State.getLockTarget('height');
-            const yValues = [...data.pillars, ...data.holes].map(p => p.y);
-            const rawHeight = Math.max(...yValues) - Math.min(...yValues);
-            const requiredPadding = (target - rawHeight) / 2;
-            
-            if (Math.abs(State.parameters.floorPaddingY - requiredPadding) > 0.00001) {
-                State.setParameter('floorPaddingY', requiredPadding);
-                this._syncPaddingUI('floorPaddingY', requiredPadding);
-                changed = true;
-            }
+            const padding = extent.minY - bounds.minY;
+            State.setParameter('floorPaddingY', padding);
+            this._syncPaddingUI('floorPaddingY', padding);
         }
-        
-        return changed;
     },
     
     _updateStats() {
@@ -469,6 +489,7 @@ const UIController = {
         
         this.elements.showMeasurements.checked = State.ui.showMeasurements;
         this.elements.linkPadding.checked = State.ui.linkPadding;
+        this.elements.skipClearanceCheck.checked = State.ui.skipClearanceCheck;
     },
     
     _syncPaddingUI(param, value) {
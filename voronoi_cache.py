@@ -0,0 +1,209 @@
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Byte-budgeted cache of Lloyd relaxation states for Voronoi layouts.
+#
+# Each configuration keeps the points of every CHECKPOINT_INTERVAL-th
+# iteration plus the last iteration requested, and the largest per-point
+# displacement of every iteration computed so far, so early stopping can be
+# decided without the intermediate points. Relaxation resumes from the
+# closest stored iteration below the one requested.
+#
+# States are written through to <CACHE_DIR>/<key>/<iteration>.npy and
+# reloaded memory-mapped after a restart. In memory, whole configurations
+# are evicted least recently used first once their arrays exceed
+# CACHE_MAX_BYTES; on disk, once the directory exceeds CACHE_DISK_MAX_BYTES.
+# Set PILLARS_VORONOI_CACHE_DIR to an empty string to keep the cache in
+# memory only.
+
+CACHE_DIR = os.environ.get(
+    'PILLARS_VORONOI_CACHE_DIR',
+    os.path.join(tempfile.gettempdir(), 'pillars-grid-voronoi-cache')
+)
+CACHE_MAX_BYTES = int(os.environ.get('PILLARS_VORONOI_CACHE_MAX_BYTES', 256 * 1024 ** 2))
+CACHE_DISK_MAX_BYTES = int(os.environ.get('PILLARS_VORONOI_CACHE_DISK_MAX_BYTES', 2 * 1024 ** 3))
+CHECKPOINT_INTERVAL = int(os.environ.get('PILLARS_VORONOI_CHECKPOINT_INTERVAL', 5))
+
+_DISPLACEMENTS = 'displacements.npy'
+
+_entries = OrderedDict()  # key -> {'points': {iteration: array}, 'displacements': array}
+_lock = threading.Lock()
+_stats = {'hit': 0, 'partial': 0, 'miss': 0}
+
+def _entry_dir(key):
+    return os.path.join(CACHE_DIR, key)
+
+def _nbytes(entry):
+    """Heap bytes held by an entry; memory-mapped states are left to the OS"""
+    arrays = [*entry['points'].values(), entry['displacements']]
+    return sum(a.nbytes for a in arrays if not isinstance(a, np.memmap))
+
+def _load_entry(key):
+    """Read a configuration's stored states from disk, memory-mapped"""
+    entry = {'points': {}, 'displacements': np.empty(0)}
+    if not CACHE_DIR:
+        return entry
+    path = _entry_dir(key)
+    try:
+        names = os.listdir(path)
+        os.utime(path)
+    except OSError:
+        return entry
+
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        try:
+            if name == _DISPLACEMENTS:
+                entry['displacements'] = np.load(os.path.join(path, name))
+            elif ext == '.npy' and stem.isdigit():
+                entry['points'][int(stem)] = np.load(os.path.join(path, name), mmap_mode='r')
+        except (OSError, ValueError):
+            continue
+    return entry
+
+def _entry(key):
+    """Entry for a configuration from memory or disk, marked most recently used"""
+    entry = _entries.get(key)
+    if entry is None:
+        entry = _entries[key] = _load_entry(key)
+    _entries.move_to_end(key)
+    return entry
+
+def _save(path, array):
+    """Write one array atomically"""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def lookup(key, iterations, tolerance=0.0):
+    """
+    Closest stored relaxation state for a configuration
+
+    Args:
+        key: configuration key
+        iterations: requested (maximum) iteration count
+        tolerance: displacement tolerance; a run that would have stopped
+            early below iterations ends at that iteration instead
+
+    Returns:
+        (target, start, points): the iteration the run ends at, the closest
+        stored iteration at or below it and its points, or (target, 0, None)
+        when nothing is stored
+    """
+    with _lock:
+        entry = _entry(key)
+        displacements = entry['displacements']
+        if tolerance > 0:
+            stopped = np.flatnonzero(displacements[:iterations] <= tolerance)
+            if len(stopped):
+                iterations = int(stopped[0]) + 1
+
+        # States are only usable where the displacement history reaches
+        stored = [k for k in entry['points'] if 0 < k <= min(iterations, len(displacements))]
+        if not stored:
+            _stats['miss'] += 1
+            return iterations, 0, None
+        start = max(stored)
+        _stats['hit' if start == iterations else 'partial'] += 1
+        return iterations, start, entry['points'][start]
+
+def record(key, iteration, points, displacement, final=False):
+    """
+    Record one relaxation iteration
+
+    Args:
+        key: configuration key
+        iteration: iteration number, from 1
+        points: points after this iteration
+        displacement: largest distance any point moved in this iteration
+        final: whether this is the iteration the request asked for; it is
+            kept even if it is not a checkpoint, replacing the previous one
+    """
+    with _lock:
+        entry = _entry(key)
+        if len(entry['displacements']) == iteration - 1:
+            entry['displacements'] = np.append(entry['displacements'], displacement)
+
+        keep = iteration % CHECKPOINT_INTERVAL == 0
+        if not (keep or final):
+            return
+
+        # Only one non-checkpoint state per configuration
+        dropped = [k for k in entry['points'] if k % CHECKPOINT_INTERVAL and k != iteration] if final else []
+        for k in dropped:
+            del entry['points'][k]
+        entry['points'][iteration] = np.array(points, dtype=float)
+
+        if CACHE_DIR:
+            try:
+                path = _entry_dir(key)
+                os.makedirs(path, exist_ok=True)
+                for k in dropped:
+                    os.remove(os.path.join(path, f'{k}.npy'))
+                _save(os.path.join(path, f'{iteration}.npy'), entry['points'][iteration])
+                _save(os.path.join(path, _DISPLACEMENTS), entry['displacements'])
+            except OSError:
+                pass
+
+        _evict_memory()
+    if CACHE_DIR and final:
+        _evict_disk()
+
+def _evict_memory():
+    """Drop least recently used configurations until memory fits the budget"""
+    total = sum(_nbytes(entry) for entry in _entries.values())
+    while total > CACHE_MAX_BYTES and len(_entries) > 1:
+        _, entry = _entries.popitem(last=False)
+        total -= _nbytes(entry)
+
+def _evict_disk():
+    """Remove least recently used configurations until the disk store fits its budget"""
+    with _lock:
+        try:
+            names = os.listdir(CACHE_DIR)
+        except OSError:
+            return
+        entries = []
+        for name in names:
+            path = os.path.join(CACHE_DIR, name)
+            try:
+                size = sum(e.stat().st_size for e in os.scandir(path))
+                entries.append((os.stat(path).st_mtime, size, path))
+            except OSError:
+                continue
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= CACHE_DISK_MAX_BYTES:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+def stats():
+    """
+    Lookup counts since startup
+
+    Returns:
+        dict with 'hit' (requested iteration stored), 'partial' (resumed
+        from an earlier iteration) and 'miss' counts
+    """
+    with _lock:
+        return dict(_stats)
+
+def clear(disk=True):
+    """Drop every cached relaxation state, and the disk store unless disk is False"""
+    with _lock:
+        _entries.clear()
+        if disk and CACHE_DIR and os.path.isdir(CACHE_DIR):
+            for name in os.listdir(CACHE_DIR):
+                shutil.rmtree(os.path.join(CACHE_DIR, name), ignore_errors=True)